@@ -0,0 +1,194 @@
+"""Local stand-in for apod.nasa.gov used by the benchmarks
+
+Serves saved APOD day pages from a corpus directory and generated JPEGs of
+several sizes, with optional per-response latency and a bandwidth cap.
+Pages and images carry ETag / Last-Modified and answer conditional requests
+with 304, like the real site.
+
+    python benchmarks/apod_server.py [--port 8000] [--latency-ms 50] [--bandwidth-kbps 2000]
+"""
+import io
+import os
+import re
+import sys
+import glob
+import time
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+# name -> (width, height)
+IMAGE_SIZES = {
+    "small": (1024, 768),
+    "medium": (2048, 1365),
+    "large": (4096, 2731),
+}
+CHUNK = 64 * 1024
+
+
+def make_image(width, height, quality=90):
+    """JPEG bytes with photo-like entropy (smooth noise), so sizes resemble real APODs"""
+    from PIL import Image
+    noise = Image.effect_noise((width // 4, height // 4), 40).resize((width, height), Image.BICUBIC)
+    img = Image.merge("RGB", (noise, noise.rotate(180), noise.transpose(Image.FLIP_LEFT_RIGHT)))
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def page_order(name):
+    """Sort key for apYYMMDD.html names by date (ap98... is older than ap26...)"""
+    yymmdd = name[2:8]
+    year = int(yymmdd[:2])
+    return (1900 if year >= 95 else 2000) + year, yymmdd[2:]
+
+
+class StandInAPOD:
+    """A threaded HTTP server in the background; use as a context manager
+
+    ``today`` is the corpus page served as astropix.html (default: the newest
+    page with a .jpg image, the only kind served). Any .jpg path that
+    is not one of the named sizes is answered with the ``default_image``.
+    """
+
+    def __init__(self, corpus=DEFAULT_CORPUS, today=None, latency_ms=0, bandwidth_kbps=0,
+                 port=0, default_image="large"):
+        self.latency = latency_ms / 1000.0
+        self.bandwidth = bandwidth_kbps * 1000 / 8 if bandwidth_kbps else 0
+        self.pages = {}
+        for path in sorted(glob.glob(os.path.join(corpus, "ap*.html"))):
+            with open(path, "rb") as f:
+                self.pages[os.path.basename(path)] = f.read()
+        if not self.pages:
+            raise ValueError(f"No apYYMMDD.html pages in {corpus}")
+        self.today = today or self._latest_image_page()
+        self.images = {name: make_image(w, h) for name, (w, h) in IMAGE_SIZES.items()}
+        self.default_image = default_image
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/apod/"
+
+    def image_url(self, name):
+        return f"{self.base_url}image/bench/{name}.jpg"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _latest_image_page(self):
+        for name in sorted(self.pages, key=page_order, reverse=True):
+            if re.search(rb'href="image/[^"]+\.jpg"', self.pages[name], re.IGNORECASE):
+                return name
+        return max(self.pages, key=page_order)
+
+    def _resolve(self, path):
+        """(body, content type) for a request path, or (None, None)"""
+        name = path.split("?")[0].rsplit("/", 1)[-1]
+        if name in ("", "astropix.html"):
+            name = self.today
+        if name in self.pages:
+            return self.pages[name], "text/html; charset=utf-8"
+        if name.lower().endswith(".jpg"):
+            image = self.images.get(name[:-4], self.images[self.default_image])
+            return image, "image/jpeg"
+        return None, None
+
+    def _handler(self):
+        server = self
+        last_modified = formatdate(time.time(), usegmt=True)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                body, content_type = server._resolve(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                start = 0
+                match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+                if match and int(match.group(1)) < len(body):
+                    start = int(match.group(1))
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body) - start))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                self._send_body(body[start:])
+
+            def _send_body(self, data):
+                sent = 0
+                started = time.perf_counter()
+                for offset in range(0, len(data), CHUNK):
+                    chunk = data[offset:offset + CHUNK]
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    if server.bandwidth:
+                        # Sleep until the bytes sent so far fit the bandwidth cap
+                        ahead = sent / server.bandwidth - (time.perf_counter() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += sent
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for apod.nasa.gov")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--bandwidth-kbps", type=float, default=0, help="0 = unlimited")
+    args = parser.parse_args(argv)
+    server = StandInAPOD(args.corpus, latency_ms=args.latency_ms,
+                         bandwidth_kbps=args.bandwidth_kbps, port=args.port)
+    print(f"Serving {len(server.pages)} pages at {server.base_url} (today = {server.today})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Compare the fast APOD page parser with the BeautifulSoup parser
+
+Usage:
+    python benchmarks/bench_parser.py [--corpus DIR] [--repeat N]
+
+The corpus is a directory of saved APOD day pages (apYYMMDD.html). A few
+sample pages ship in benchmarks/corpus; point --corpus at a folder of real
+saved pages (e.g. from a backfill run) for representative numbers. The
+shipped pages have their exact expected fields in corpus/expected.json; any
+mismatch is reported and makes the run exit non-zero.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from apod_parser import parse_fast, parse_soup, ParseError  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+# {page file name: {'title', 'description', 'image_href'}} the fast parser must produce
+EXPECTED_FILE = "expected.json"
+
+
+def time_parser(parse, pages, repeat):
+    """Best-of-repeat total seconds to parse every page once"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            try:
+                parse(html)
+            except ParseError:
+                pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare(name, html, expected=None):
+    """Check the fast parser on one page; returns a list of issues
+
+    Pages listed in the corpus's expected.json must parse to exactly the
+    recorded fields. Other pages are checked against BeautifulSoup for the
+    title and image link only: its html.parser tree nests unclosed <p> tags,
+    so its explanation runs on into the page footer.
+    """
+    try:
+        fast = parse_fast(html)
+    except ParseError as e:
+        return [f"{name}: fast parser gave up ({e}), would fall back"]
+    if expected is not None:
+        return [f"{name}: {key} differs: {fast[key]!r} != {value!r}"
+                for key, value in expected.items() if fast.get(key) != value]
+    soup = parse_soup(html)
+    return [f"{name}: {key} differs: {fast[key]!r} != {soup[key]!r}"
+            for key in ('title', 'image_href') if fast[key] != soup[key]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="directory of saved APOD pages")
+    parser.add_argument("--repeat", type=int, default=20, help="timing repetitions (best is kept)")
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.corpus, "*.html")))
+    if not paths:
+        print(f"No .html pages found in {args.corpus}")
+        return 1
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+
+    expected = {}
+    expected_path = os.path.join(args.corpus, EXPECTED_FILE)
+    if os.path.exists(expected_path):
+        with open(expected_path, 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+
+    issues = []
+    for path, html in zip(paths, pages):
+        name = os.path.basename(path)
+        issues.extend(compare(name, html, expected.get(name)))
+
+    fast = time_parser(parse_fast, pages, args.repeat)
+    soup = time_parser(parse_soup, pages, args.repeat)
+    n = len(pages)
+    print(f"Pages:          {n}")
+    print(f"BeautifulSoup:  {soup / n * 1e3:8.3f} ms/page")
+    print(f"Fast parser:    {fast / n * 1e3:8.3f} ms/page")
+    print(f"Speed-up:       {soup / fast:8.1f}x")
+    for issue in issues:
+        print(f"MISMATCH {issue}")
+    return 1 if issues else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
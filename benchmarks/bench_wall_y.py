@@ -0,0 +1,218 @@
+"""Time wall-y's pipeline against a local stand-in APOD server
+
+Usage:
+    python benchmarks/bench_wall_y.py [--repeat N] [--latency-ms MS] [--bandwidth-kbps KBPS]
+                                      [--output FILE] [--baseline FILE] [--save-baseline]
+
+Stages are timed separately:
+    image_info_full    get_latest_image_info: full page GET + parse
+    image_info_304     get_latest_image_info: conditional GET answered 304
+    download_<size>    download_image for small/medium/large JPEGs (no metadata)
+    metadata_<size>    build_exif + embed_jpeg_exif on a stored file
+    update_cold        update_wallpaper on an empty archive (fetch, download, metadata, variant)
+    update_warm        update_wallpaper with the image already archived
+
+Results are written as JSON. When a baseline file exists, every stage's
+median is compared with it and the run fails if any stage is slower than
+the baseline by more than --tolerance.
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import datetime
+import tempfile
+import statistics
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+sys.path.insert(0, BENCH_DIR)
+from apod_server import StandInAPOD, IMAGE_SIZES, DEFAULT_CORPUS  # noqa: E402
+from apod_core import APODWallpaper, load_settings  # noqa: E402
+from image_metadata import build_exif, embed_jpeg_exif  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "results", "baseline.json")
+# Differences below this are noise whatever the ratio
+NOISE_FLOOR_MS = 2.0
+
+
+def summarize(samples, **extra):
+    """Timing samples (seconds) -> result entry in milliseconds"""
+    ms = [s * 1000 for s in samples]
+    result = {"median_ms": round(statistics.median(ms), 3), "min_ms": round(min(ms), 3), "runs": len(ms)}
+    result.update(extra)
+    return result
+
+
+class Bench:
+    def __init__(self, server, repeat, work_dir):
+        self.server = server
+        self.repeat = repeat
+        self.work_dir = work_dir
+        self.settings = load_settings()
+        self.settings.update({
+            "APOD_BASE_URL": server.base_url,
+            "APOD_TODAY_URL": server.base_url + "astropix.html",
+            "APOD_ARCHIVE_URL": server.base_url + "archivepixFull.html",
+            "DEBUG_MODE": False,
+            "WALLPAPER_BACKEND": "none",
+        })
+        self._runs = 0
+
+    def wallpaper(self, **overrides):
+        """A fresh APODWallpaper on an empty archive directory"""
+        self._runs += 1
+        settings = dict(self.settings, **overrides)
+        wallpaper = APODWallpaper(settings, download_dir=os.path.join(self.work_dir, f"run{self._runs}"))
+        wallpaper.screen_size = (1920, 1080)
+        return wallpaper
+
+    def image_info(self):
+        full, not_modified = [], []
+        for _ in range(self.repeat):
+            wallpaper = self.wallpaper()
+            start = time.perf_counter()
+            info = wallpaper.get_latest_image_info()
+            full.append(time.perf_counter() - start)
+            assert info, "stand-in today page did not parse"
+
+            wallpaper.refresh_image_info()
+            start = time.perf_counter()
+            wallpaper.get_latest_image_info()
+            not_modified.append(time.perf_counter() - start)
+        return {"image_info_full": summarize(full), "image_info_304": summarize(not_modified)}
+
+    def download(self):
+        results = {}
+        wallpaper = self.wallpaper(METADATA_MODE="sidecar")
+        for name in IMAGE_SIZES:
+            url = self.server.image_url(name)
+            info = {"url": url, "title": f"Bench {name}", "description": "", "date": "2000-01-01"}
+            samples = []
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                path = wallpaper.download_image(url, info)
+                samples.append(time.perf_counter() - start)
+                assert path, f"download of {name} failed"
+                wallpaper.image_store.remove(path)
+                os.remove(path)
+            size = len(self.server.images[name])
+            results[f"download_{name}"] = summarize(
+                samples, bytes=size, mb_per_s=round(size / statistics.median(samples) / 1e6, 2))
+        return results
+
+    def metadata(self):
+        results = {}
+        info = {"title": "APOD: 2000 January 1 - Bench", "description": "x" * 1500, "date": "2000-01-01"}
+        for name in IMAGE_SIZES:
+            path = os.path.join(self.work_dir, f"meta_{name}.jpg")
+            samples = []
+            for _ in range(self.repeat):
+                with open(path, "wb") as f:
+                    f.write(self.server.images[name])
+                start = time.perf_counter()
+                embed_jpeg_exif(path, build_exif(path, info))
+                samples.append(time.perf_counter() - start)
+            results[f"metadata_{name}"] = summarize(samples)
+        return results
+
+    def update(self):
+        cold, warm = [], []
+        for _ in range(self.repeat):
+            wallpaper = self.wallpaper()
+            start = time.perf_counter()
+            success, _ = wallpaper.update_wallpaper()
+            cold.append(time.perf_counter() - start)
+            assert success, "update_wallpaper failed"
+
+            wallpaper.refresh_image_info()
+            start = time.perf_counter()
+            wallpaper.update_wallpaper()
+            warm.append(time.perf_counter() - start)
+            wallpaper.shutdown_variant_pool()
+        return {"update_cold": summarize(cold), "update_warm": summarize(warm)}
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing each stage against the baseline, and whether any regressed"""
+    lines, regressed = [], False
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            lines.append(f"{name:18} {result['median_ms']:10.2f} ms   (no baseline)")
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        slower = (ratio > 1 + tolerance and
+                  result["median_ms"] - base["median_ms"] > NOISE_FLOOR_MS)
+        regressed = regressed or slower
+        lines.append(f"{name:18} {result['median_ms']:10.2f} ms   baseline {base['median_ms']:10.2f} ms"
+                     f"   {ratio:5.2f}x{'   REGRESSION' if slower else ''}")
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="directory of saved APOD pages")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage (median is reported)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every response")
+    parser.add_argument("--bandwidth-kbps", type=float, default=0, help="server bandwidth cap, 0 = unlimited")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write this run's JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="wall-y-bench-")
+    results = {}
+    try:
+        with StandInAPOD(args.corpus, latency_ms=args.latency_ms,
+                         bandwidth_kbps=args.bandwidth_kbps) as server:
+            bench = Bench(server, args.repeat, work_dir)
+            # The core logs every step; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                for stage in (bench.image_info, bench.download, bench.metadata, bench.update):
+                    results.update(stage())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "config": {"repeat": args.repeat, "latency_ms": args.latency_ms,
+                   "bandwidth_kbps": args.bandwidth_kbps, "corpus": os.path.abspath(args.corpus)},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline_report = json.load(f)
+        if baseline_report.get("config", {}).get("latency_ms") != args.latency_ms or \
+                baseline_report.get("config", {}).get("bandwidth_kbps") != args.bandwidth_kbps:
+            print("Note: baseline was recorded with different network settings")
+        baseline = baseline_report.get("results", {})
+    lines, regressed = compare(results, baseline, args.tolerance)
+    print("\n".join(lines))
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
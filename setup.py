@@ -8,12 +8,13 @@ from cx_Freeze import setup, Executable
 SRC_DIR = "src"
 ASSETS_DIR = "assets"
 MAIN_SCRIPT = os.path.join(SRC_DIR, "apod_wallpaper.py")
+CLI_SCRIPT = os.path.join(SRC_DIR, "cli.py")
 ICON_FILE = os.path.join(ASSETS_DIR, "wall-y-round.ico")
 
 # Dependencies are automatically detected, but it might need fine tuning.
 build_exe_options = {
     "packages": [
-        "os", "sys", "ctypes", "requests", "bs4", "PyQt5", "PIL", "urllib3", "chardet", "datetime", "traceback"
+        "os", "sys", "ctypes", "requests", "bs4", "PyQt5", "PIL", "urllib3", "chardet", "datetime", "traceback", "zoneinfo", "tzdata"
     ],
     "excludes": [
         "PyQt5.QtQml", "PyQt5.QtQuick", "pytest", "html5lib", "lxml", "tkinter"
@@ -48,6 +49,13 @@ setup(
             shortcut_name="wall-y",
             shortcut_dir="DesktopFolder",
             target_name="wall_y.exe"
+        ),
+        # Console companion for scripts and batch jobs (no tray, no Qt)
+        Executable(
+            CLI_SCRIPT,
+            base=None,
+            icon=ICON_FILE,
+            target_name="wall-y.exe" if sys.platform == "win32" else "wall-y"
         )
     ]
 )
\ No newline at end of file
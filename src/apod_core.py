@@ -0,0 +1,700 @@
+import sys, os
+import datetime
+import threading
+import logging
+# PIL, requests and bs4 are imported where first used, keeping them off the startup path
+from image_metadata import build_exif, embed_jpeg_exif, embed_png_text
+from apod_parser import parse_page, parse_title_date
+from page_cache import PageCache
+from image_store import ImageStore
+from image_probe import ImageRejected, SizeCheck, probe_file
+from wallpaper_variants import make_variant, make_monitor_variants, create_executor
+from wallpaper_backends import get_backend
+from history import History
+from publish_time import apod_today
+from retention import Retention
+from single_flight import SingleFlight
+from circuit_breaker import CircuitBreaker
+from telemetry import tracer, span, annotate, configure_logging
+
+log = logging.getLogger("wall-y")
+
+# Smaller images are not used as wallpaper
+MIN_IMAGE_SIZE = (800, 600)
+
+
+def load_settings(env_path=None):
+    settings = {}
+    # Try to find settings.env in the right place depending on frozen/script mode
+    possible_paths = []
+    if env_path:
+        possible_paths.append(env_path)
+    if getattr(sys, 'frozen', False):
+        # If frozen, look next to the executable (build output)
+        exe_dir = os.path.dirname(sys.executable)
+        possible_paths.append(os.path.join(exe_dir, "src", "settings.env"))
+        possible_paths.append(os.path.join(exe_dir, "settings.env"))
+    # Always try script dir (src/)
+    possible_paths.append(os.path.join(os.path.dirname(__file__), "settings.env"))
+
+    env_found = False
+    for path in possible_paths:
+        if os.path.exists(path):
+            env_found = True
+            with open(path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#') and '=' in line:
+                        k, v = line.split('=', 1)
+                        settings[k.strip()] = v.strip()
+            break
+
+    if not env_found:
+        # Reported by the caller; importing this module must not exit the process
+        log.warning("Could not find settings.env, using defaults. Searched paths:\n" +
+              "\n".join(possible_paths))
+    settings["SETTINGS_PATH"] = path if env_found else None
+
+    # Convert types
+    settings.setdefault("APOD_BASE_URL", "https://apod.nasa.gov/apod/")
+    settings.setdefault("APOD_ARCHIVE_URL", "https://apod.nasa.gov/apod/archivepixFull.html")
+    settings.setdefault("APOD_TODAY_URL", "https://apod.nasa.gov/apod/astropix.html")
+    # Real site to use when APOD_BASE_URL points at a LAN mirror that is down (empty = no mirror)
+    settings.setdefault("APOD_FALLBACK_URL", "")
+    # Mirror mode (wall-y mirror): listen address, port and how long a page is served before revalidating
+    settings.setdefault("MIRROR_BIND", "0.0.0.0")
+    settings["MIRROR_PORT"] = int(settings.get("MIRROR_PORT", "8470"))
+    settings["MIRROR_PAGE_TTL"] = int(settings.get("MIRROR_PAGE_TTL", "300"))
+    settings["DEBUG_MODE"] = settings.get("DEBUG_MODE", "False") == "True"
+    settings["ENABLE_WALLPAPER"] = settings.get("ENABLE_WALLPAPER", "True") == "True"
+    settings["ENABLE_SCREENSAVER"] = settings.get("ENABLE_SCREENSAVER", "False") == "True"
+    # fill = scale and crop to the screen, fit = scale inside it, original = apply the full-size file
+    settings["WALLPAPER_FIT"] = settings.get("WALLPAPER_FIT", "fill").lower()
+    # auto = pick for this platform, windows, gnome (Linux), none = only prepare the files
+    settings["WALLPAPER_BACKEND"] = settings.get("WALLPAPER_BACKEND", "auto").lower()
+    settings["IMAGE_INFO_TTL"] = int(settings.get("IMAGE_INFO_TTL", "60"))
+    settings["HTTP_CONNECT_TIMEOUT"] = float(settings.get("HTTP_CONNECT_TIMEOUT", "5"))
+    settings["HTTP_READ_TIMEOUT"] = float(settings.get("HTTP_READ_TIMEOUT", "30"))
+    settings["HTTP_RETRIES"] = int(settings.get("HTTP_RETRIES", "3"))
+    settings["HTTP_BACKOFF"] = float(settings.get("HTTP_BACKOFF", "1.0"))
+    settings["HTTP_POOL_SIZE"] = int(settings.get("HTTP_POOL_SIZE", "4"))
+    settings.setdefault("HTTP_USER_AGENT", "wall-y/0.1")
+    # "embed" writes EXIF/PNG text into the image plus a .txt sidecar; "sidecar" only the .txt
+    settings["METADATA_MODE"] = settings.get("METADATA_MODE", "embed").lower()
+    # Video / non-image days: latest = most recent archived image, random = any archived image,
+    # keep = leave the current wallpaper
+    settings["NO_IMAGE_FALLBACK"] = settings.get("NO_IMAGE_FALLBACK", "latest").lower()
+    # Archive limits (0 = unlimited); lru evicts least recently used, favorites also spares favorites
+    settings["RETENTION_MAX_MB"] = int(settings.get("RETENTION_MAX_MB", "0"))
+    settings["RETENTION_MAX_ITEMS"] = int(settings.get("RETENTION_MAX_ITEMS", "0"))
+    settings["RETENTION_MAX_AGE_DAYS"] = int(settings.get("RETENTION_MAX_AGE_DAYS", "0"))
+    settings["RETENTION_POLICY"] = settings.get("RETENTION_POLICY", "lru").lower()
+    # Upstream circuit breaker: consecutive failures that open it, first and longest probe delay (s)
+    settings["BREAKER_FAILURES"] = int(settings.get("BREAKER_FAILURES", "3"))
+    settings["BREAKER_BACKOFF"] = int(settings.get("BREAKER_BACKOFF", "60"))
+    settings["BREAKER_MAX_BACKOFF"] = int(settings.get("BREAKER_MAX_BACKOFF", "3600"))
+    # Per-phase spans as JSON lines under logs/, counters on a loopback port (0 = off)
+    settings["METRICS_LOG"] = settings.get("METRICS_LOG", "True") == "True"
+    settings["METRICS_PORT"] = int(settings.get("METRICS_PORT", "0"))
+    return settings
+
+
+class APODWallpaper:
+    """Fetch, parse, download, archive and apply APOD images (no Qt or desktop session needed)
+
+    ``settings`` is a dict from load_settings(); the tray app passes its own
+    so changes made in the settings dialog apply here too.
+    """
+
+    def __init__(self, settings=None, download_dir=None, backend=None):
+        self.settings = settings if settings is not None else load_settings()
+        settings = self.settings
+        # Use settings for URLs
+        self.base_url = settings["APOD_BASE_URL"]
+        self.archive_url = settings["APOD_ARCHIVE_URL"]
+        self.today_url = settings["APOD_TODAY_URL"]
+
+        # Set default download directory to wall-y under Pictures
+        pictures_dir = os.path.join(os.path.expanduser("~"), "Pictures")
+        self.download_dir = download_dir or os.path.join(pictures_dir, "wall-y")
+        # Create download directory if it doesn't exist
+        if not os.path.exists(self.download_dir):
+            os.makedirs(self.download_dir)
+
+        # Diagnostics go to logs/wall-y.log beside the metrics (frozen GUI builds have no console)
+        configure_logging(os.path.join(self.download_dir, "logs", "wall-y.log"))
+
+        # Debug logging
+        if settings["DEBUG_MODE"]:
+            log.info("Debug mode enabled")
+            log.info(f"Base URL: {self.base_url}")
+            log.info(f"Download directory: {self.download_dir}")
+
+        if settings["METRICS_LOG"]:
+            tracer.configure(os.path.join(self.download_dir, "logs", "metrics.jsonl"))
+
+        # Screensaver toggle
+        self.enable_screensaver = settings["ENABLE_SCREENSAVER"]
+
+        self.current_image_url = None
+        self.current_description = None
+        self.current_title = None
+
+        # Screen size in physical pixels, set by the tray app; None applies originals as-is
+        self.screen_size = None
+        # Monitor layout ([{name, x, y, width, height}] in physical pixels), set by the tray app
+        self.monitors = []
+        # Process pool for per-monitor variants, created on first multi-monitor apply
+        self._variant_pool = None
+
+        # One keep-alive session (pooling, retries with jittered backoff, User-Agent) for every
+        # request; built on first use so requests is not imported before the tray is up
+        self._session = None
+        self._session_lock = threading.Lock()
+        # Fed by the session's adapters; checked before each upstream fetch path
+        self.breaker = CircuitBreaker(settings["BREAKER_FAILURES"], settings["BREAKER_BACKOFF"],
+                                      settings["BREAKER_MAX_BACKOFF"])
+
+        # Conditional-GET cache for the today page (survives restarts)
+        self.cache_dir = os.path.join(self.download_dir, "cache")
+        self.page_cache = PageCache(os.path.join(self.cache_dir, "page_cache.json"))
+        # Screen-sized copies of archived images, cached per resolution and fit mode
+        self.variants_dir = os.path.join(self.cache_dir, "variants")
+        # Gallery thumbnails, generated on demand
+        self.thumbs_dir = os.path.join(self.cache_dir, "thumbs")
+        # Every download path resolves images through one content-addressed store
+        self.image_store = ImageStore(self.download_dir, os.path.join(self.cache_dir, "image_store.json"),
+                                      session=lambda: self.session)
+        self.backend = get_backend(backend or settings["WALLPAPER_BACKEND"], self.variants_dir)
+        # Indexed history of APOD days and app state (replaces last_image.txt / last_update.txt)
+        self.history = History(os.path.join(self.download_dir, "history.db"))
+        if not self.history.get_state("legacy_imported"):
+            imported = self.history.import_legacy(self.download_dir, self.read_metadata_from_image)
+            log.info(f"Imported {imported} existing APOD days into the history index")
+        if settings["DEBUG_MODE"]:
+            log.info(f"Page cache stats: {self.page_cache.stats()}")
+        self.retention = Retention(self.history, self.image_store, self.download_dir, self.variants_dir,
+                                   thumbs_dir=self.thumbs_dir,
+                                   max_bytes=settings["RETENTION_MAX_MB"] * 1024 * 1024,
+                                   max_items=settings["RETENTION_MAX_ITEMS"],
+                                   max_age_days=settings["RETENTION_MAX_AGE_DAYS"],
+                                   policy=settings["RETENTION_POLICY"])
+
+        # One page request per update cycle: memoize briefly and coalesce concurrent lookups
+        self._image_info_flight = SingleFlight(self.fetch_latest_image_info, ttl=settings["IMAGE_INFO_TTL"])
+        # Overlapping update requests (timer + manual) share a single run
+        self._update_flight = SingleFlight(self._update_wallpaper)
+    
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    from http_session import create_session
+                    self._session = create_session(self.settings, breaker=self.breaker)
+        return self._session
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+
+    def get_latest_image_info(self):
+        """Return the latest image info, sharing one fetch between back-to-back or concurrent callers"""
+        return self._image_info_flight()
+
+    def refresh_image_info(self):
+        """Forget the memoized image info so the next lookup hits the network"""
+        self._image_info_flight.invalidate()
+
+    def fetch_latest_image_info(self):
+        """Fetch the APOD today page (conditionally) and return the latest image info"""
+        from http_session import retry_count
+        # A day already known to have no image needs no fetch until the next publish
+        no_image = self.history.get_no_image(apod_today())
+        if no_image:
+            with span("fetch", url=self.today_url, cache_hit=True, no_image=True):
+                return self._no_image_info(no_image)
+        if not self.breaker.allow():
+            # Upstream is down: answer from the last parsed page, no network
+            with span("fetch", url=self.today_url, cache_hit=True, breaker=self.breaker.state):
+                entry = self.page_cache.get(self.today_url)
+                return entry["parsed"] if entry else None
+        try:
+            with span("fetch", url=self.today_url):
+                headers = self.page_cache.conditional_headers(self.today_url)
+                response = self.session.get(self.today_url, headers=headers)
+                annotate(status=response.status_code, retries=retry_count(response),
+                         cache_hit=response.status_code == 304)
+                if response.status_code == 304:
+                    entry = self.page_cache.hit(self.today_url)
+                    if entry is not None:
+                        if self.settings["DEBUG_MODE"]:
+                            log.info(f"Today page not modified, using cached result {self.page_cache.stats()}")
+                        return entry["parsed"]
+                    # Validators without an entry should not happen; refetch unconditionally
+                    response = self.session.get(self.today_url)
+                    annotate(status=response.status_code, cache_hit=False)
+                annotate(bytes=len(response.content))
+
+                if response.status_code != 200:
+                    log.warning(f"Failed to fetch today page: {response.status_code}")
+                    annotate(error=f"HTTP {response.status_code}")
+                    return None
+
+            with span("parse"):
+                fields = parse_page(response.text)
+                image_info = self.image_info_from_fields(fields)
+                annotate(image=bool(image_info))
+            if image_info is None:
+                if not self.is_apod_day_page(response.text, fields):
+                    log.warning("Today page has no image and does not look like an APOD page; not caching it")
+                    annotate(error="not an APOD page")
+                    return None
+                image_info = self.record_no_image(fields, self.today_url)
+            self.page_cache.store(self.today_url, response, image_info)
+            return image_info
+        except Exception as e:
+            log.exception(f"Error getting latest image info: {e}")
+            return None
+
+    def parse_image_info(self, html, page_url=None, date=None):
+        """Parse an APOD page to find the image URL, title and description
+
+        page_url and date default to the today page and the current date; the
+        archive backfill passes the day page URL and its APOD date instead.
+        """
+        return self.image_info_from_fields(parse_page(html), page_url, date)
+
+    def image_info_from_fields(self, fields, page_url=None, date=None):
+        """Image info from parse_page() fields, or None when the page has no image"""
+        apod_date = date or parse_title_date(fields['title'])
+
+        image_url = None
+        img_href = fields['image_href']
+        if img_href:
+            if img_href.startswith('http'):
+                image_url = img_href
+            else:
+                image_url = self.base_url + img_href
+
+        if image_url:
+            return {
+                'url': image_url,
+                'title': fields['title'],
+                'description': fields['description'],
+                'page_url': page_url or self.today_url,
+                # APOD's own (US Eastern) date when the page states it, else today's local date
+                'date': apod_date or datetime.datetime.now().strftime("%Y-%m-%d"),
+                'apod_date': apod_date
+            }
+
+        return None
+
+    @staticmethod
+    def is_apod_day_page(html, fields):
+        """Whether an image-less page is really an APOD day: a dated title and an explanation
+
+        Captive portals, proxy error and maintenance pages or a truncated
+        response also arrive as 200 without an image; negative-caching those
+        would suppress fetches for the rest of the day.
+        """
+        return bool(parse_title_date(fields['title'])) and 'Explanation:' in html
+
+    def record_no_image(self, fields, page_url, date=None):
+        """Add a non-image day (video, embedded media) to the negative cache and describe it
+
+        Only for pages that passed is_apod_day_page().
+        """
+        date = date or parse_title_date(fields['title'])
+        self.history.mark_no_image(date, page_url=page_url, title=fields['title'],
+                                   description=fields['description'])
+        log.info(f"APOD for {date} has no image; using the {self.settings['NO_IMAGE_FALLBACK']} fallback")
+        return self._no_image_info(self.history.get_no_image(date))
+
+    def _no_image_info(self, record):
+        """Image info for a negative cache record: no 'url', ``no_image`` set"""
+        return {
+            'no_image': True,
+            'title': record['title'],
+            'description': record['description'],
+            'page_url': record['page_url'],
+            'date': record['date'],
+            'apod_date': record['date'],
+        }
+
+    def apply_fallback(self, image_info):
+        """Show an archived image on a non-image day, per NO_IMAGE_FALLBACK
+
+        Returns (success, image URL) like update_wallpaper; the URL is None
+        because no new APOD was applied.
+        """
+        policy = self.settings["NO_IMAGE_FALLBACK"]
+        # Done at most once per day automatically; is_new_image_available checks this
+        self.history.set_state("fallback_date", image_info['date'])
+        if policy == "keep":
+            log.info(f"No image for {image_info['date']}; keeping the current wallpaper")
+            return True, None
+        record = self.history.fallback_image(policy)
+        if not record:
+            log.warning(f"No image for {image_info['date']} and nothing archived to fall back to")
+            return True, None
+        log.info(f"No image for {image_info['date']}; showing {record['date']} instead")
+        if self.settings["ENABLE_WALLPAPER"] and self.set_wallpaper(record['local_path']):
+            self.history.mark_applied(record['url'], latest=False)
+            self.current_title = record.get('title') or 'NASA APOD'
+            self.current_description = record.get('description') or ''
+        return True, None
+
+    def download_image(self, url, image_info):
+        """Download the image from the given URL into the image store"""
+        try:
+            with span("download", url=url):
+                # Already stored (and validated) on an earlier update
+                filepath = self.image_store.lookup(url)
+                annotate(cache_hit=bool(filepath))
+                if filepath:
+                    return filepath
+                if not self.breaker.allow():
+                    log.warning("Upstream unavailable; not downloading until the next probe")
+                    annotate(breaker=self.breaker.state)
+                    return None
+
+                # Content-Type and size are checked from the first KB; rejects stop the transfer
+                try:
+                    filepath = self.image_store.fetch(url, check=SizeCheck(*MIN_IMAGE_SIZE))
+                except ImageRejected as e:
+                    log.warning(f"Image rejected: {e}")
+                    annotate(rejected=str(e))
+                    return None
+                if not filepath:
+                    annotate(error="download failed")
+                    return None
+            filename = os.path.basename(filepath)
+
+            # Files adopted from disk were not streamed through the check: read their header
+            header = probe_file(filepath)
+            if header:
+                _, width, height = header
+            else:
+                from PIL import Image
+                try:
+                    with Image.open(filepath) as img:
+                        width, height = img.width, img.height
+                except Exception as e:
+                    log.warning(f"Invalid image file: {e}")
+                    return None
+            if width < MIN_IMAGE_SIZE[0] or height < MIN_IMAGE_SIZE[1]:
+                log.warning(f"Image dimensions too small: {width}x{height}")
+                return None
+
+            with span("metadata", mode=self.settings["METADATA_MODE"]):
+                sha256 = self.image_store.hash_for(url)
+                # Save metadata to the image unless only sidecar files are wanted
+                if self.settings["METADATA_MODE"] != "sidecar":
+                    if filename.lower().endswith('.jpg') or filename.lower().endswith('.jpeg'):
+                        self.save_metadata_to_jpeg(filepath, image_info)
+                    elif filename.lower().endswith('.png'):
+                        self.save_metadata_to_png(filepath, image_info)
+                    # The file was rewritten in place; keep the recorded digest true to its bytes
+                    sha256 = self.image_store.rehash(filepath)
+
+                # Also save metadata to a separate text file with the same date
+                self.save_metadata_to_file(image_info)
+
+                self.history.record_image(image_info, local_path=filepath, sha256=sha256,
+                                          width=width, height=height)
+            return filepath
+        except Exception as e:
+            log.exception(f"Error downloading image: {e}")
+            return None
+    
+    def save_metadata_to_jpeg(self, filepath, image_info):
+        """Save metadata to JPEG image by splicing in an EXIF segment (no re-encode)"""
+        try:
+            embed_jpeg_exif(filepath, build_exif(filepath, image_info))
+        except Exception as e:
+            log.error(f"Error saving metadata to JPEG: {e}")
+    
+    def save_metadata_to_png(self, filepath, image_info):
+        """Save metadata to PNG image by inserting text chunks (no re-encode)"""
+        try:
+            embed_png_text(filepath, {
+                "Title": image_info.get('title', ''),
+                "Description": image_info.get('description', ''),
+                "Date": image_info.get('date', ''),
+            })
+        except Exception as e:
+            log.error(f"Error saving metadata to PNG: {e}")
+    
+    def save_metadata_to_file(self, image_info):
+        """Save metadata to a text file with the date in the filename"""
+        try:
+            date_str = image_info.get('date', datetime.datetime.now().strftime("%Y-%m-%d"))
+            metadata_file = os.path.join(self.download_dir, f"apod_{date_str}.txt")
+            
+            with open(metadata_file, 'w', encoding='utf-8') as f:
+                f.write(f"Title: {image_info.get('title', '')}\n\n")
+                f.write(f"Date: {date_str}\n\n")
+                f.write(f"Description: {image_info.get('description', '')}\n\n")
+                f.write(f"URL: {image_info.get('page_url', '')}")
+        except Exception as e:
+            log.error(f"Error saving metadata to file: {e}")
+    
+    def read_metadata_from_image(self, image_path):
+        """Read metadata from an image file"""
+        try:
+            if not os.path.exists(image_path):
+                return None
+            
+            from PIL import Image
+            img = Image.open(image_path)
+            metadata = {}
+            
+            if image_path.lower().endswith(('.jpg', '.jpeg')):
+                # Read EXIF data from JPEG
+                exif_data = img.getexif() if hasattr(img, 'getexif') else None
+                if exif_data:
+                    metadata['description'] = exif_data.get(0x9286, '')  # UserComment
+                    metadata['title'] = exif_data.get(0x010e, '')  # ImageDescription
+                    metadata['date'] = exif_data.get(0x9003, '')  # DateTimeOriginal
+            
+            elif image_path.lower().endswith('.png'):
+                # Read metadata from PNG
+                if 'Title' in img.info:
+                    metadata['title'] = img.info['Title']
+                if 'Description' in img.info:
+                    metadata['description'] = img.info['Description']
+                if 'Date' in img.info:
+                    metadata['date'] = img.info['Date']
+            
+            img.close()
+            return metadata
+        except Exception as e:
+            log.error(f"Error reading metadata from image: {e}")
+            return None
+    
+    def set_wallpaper(self, image_url):
+        """Resolve the image to its stored file and set it as wallpaper."""
+        if image_url.startswith("http"):
+            if not self.image_store.lookup(image_url) and not self.breaker.allow():
+                log.warning("Upstream unavailable; wallpaper left unchanged")
+                return False
+            try:
+                local_path = self.image_store.fetch(image_url, check=SizeCheck(*MIN_IMAGE_SIZE))
+            except ImageRejected as e:
+                log.warning(f"Image rejected: {e}")
+                return False
+            except Exception as e:
+                log.error(f"Error downloading wallpaper: {e}")
+                return False
+            if not local_path:
+                return False
+        else:
+            local_path = image_url
+        # Hand the OS screen-sized copies; the original stays in the archive
+        with span("apply", backend=self.backend.name, monitors=len(self.monitors) or 1):
+            try:
+                if len(self.monitors) > 1 and self.settings["WALLPAPER_FIT"] != "original":
+                    variants = self.prepare_monitor_variants(local_path)
+                    if variants:
+                        ok = self.backend.apply_per_monitor(local_path, variants, self.monitors)
+                        annotate(ok=bool(ok))
+                        log.info(f"Wallpaper set on {len(variants)} monitors: {local_path}")
+                        return ok
+                local_path = self.prepare_wallpaper(local_path)
+                ok = self.backend.apply(local_path)
+                annotate(ok=bool(ok))
+                log.info(f"Wallpaper set successfully: {local_path}")
+                return ok
+            except Exception as e:
+                log.error(f"Error setting wallpaper: {e}")
+                annotate(error=str(e))
+                return False
+    
+    def prepare_wallpaper(self, local_path):
+        """Return the file to apply: a variant matched to the screen size and fit mode"""
+        mode = self.settings["WALLPAPER_FIT"]
+        if not self.screen_size or mode == "original":
+            return local_path
+        try:
+            return make_variant(local_path, self.variants_dir, *self.screen_size, mode=mode)
+        except Exception as e:
+            log.error(f"Error preparing wallpaper variant, using original: {e}")
+            return local_path
+
+    def prepare_monitor_variants(self, local_path):
+        """Return {monitor name: variant path}, generated in parallel (None on failure)"""
+        mode = self.settings["WALLPAPER_FIT"]
+        try:
+            if self._variant_pool is None:
+                self._variant_pool = create_executor(self.monitors)
+            return make_monitor_variants(local_path, self.variants_dir, self.monitors,
+                                         mode=mode, executor=self._variant_pool)
+        except Exception as e:
+            log.error(f"Error preparing per-monitor variants, using a single variant: {e}")
+            return None
+
+    def set_monitors(self, monitors):
+        """Record a new monitor layout; the pool is resized on next use"""
+        if monitors == self.monitors:
+            return False
+        self.monitors = monitors
+        self.shutdown_variant_pool()
+        return True
+
+    def shutdown_variant_pool(self):
+        if self._variant_pool is not None:
+            self._variant_pool.shutdown(wait=False)
+            self._variant_pool = None
+
+    def set_screensaver_wallpaper(self, image_url):
+        """Resolve the image to its stored file and hand it to the backend's lock screen support."""
+        if image_url.startswith("http"):
+            if not self.image_store.lookup(image_url) and not self.breaker.allow():
+                log.warning("Upstream unavailable; lock screen wallpaper left unchanged")
+                return False
+            try:
+                local_path = self.image_store.fetch(image_url, check=SizeCheck(*MIN_IMAGE_SIZE))
+            except ImageRejected as e:
+                log.warning(f"Image rejected: {e}")
+                return False
+            except Exception as e:
+                log.error(f"Error downloading lock screen wallpaper: {e}")
+                return False
+            if not local_path:
+                return False
+        else:
+            local_path = image_url
+        try:
+            return self.backend.set_lock_screen(local_path)
+        except Exception as e:
+            log.error(f"Error setting lock screen wallpaper: {e}")
+            return False
+
+    def get_current_wallpaper(self):
+        """Get the path of the current wallpaper"""
+        try:
+            return self.backend.current()
+        except Exception as e:
+            log.error(f"Error getting current wallpaper: {e}")
+            return None
+    
+    def fetch_day(self, date):
+        """Fetch and download a past APOD day (YYYY-MM-DD); returns (image_info, local path)"""
+        day = datetime.date.fromisoformat(date)
+        if self.history.get_no_image(date):
+            log.info(f"{date}: no image on this day")
+            return None, None
+        if not self.breaker.allow():
+            log.warning(f"{date}: upstream unavailable, try again later")
+            return None, None
+        page_url = f"{self.base_url}ap{day:%y%m%d}.html"
+        response = self.session.get(page_url)
+        if response.status_code != 200:
+            log.warning(f"{date}: page returned {response.status_code}")
+            return None, None
+        fields = parse_page(response.text)
+        image_info = self.image_info_from_fields(fields, page_url=page_url, date=date)
+        if not image_info:
+            if not self.is_apod_day_page(response.text, fields):
+                log.warning(f"{date}: page has no image and does not look like an APOD page")
+                return None, None
+            self.history.mark_no_image(date, page_url=page_url, title=fields['title'],
+                                       description=fields['description'])
+            log.info(f"{date}: no image on this day")
+            return None, None
+        return image_info, self.download_image(image_info['url'], image_info)
+
+    def update_wallpaper(self):
+        """Update the wallpaper, joining an update that is already running"""
+        return self._update_flight()
+
+    def _update_wallpaper(self):
+        """Main function to update the wallpaper"""
+        with span("update"):
+            return self._run_update()
+
+    def _run_update(self):
+        try:
+            # Ensure current_image_url is set when fetching the latest image
+            image_info = self.get_latest_image_info()
+            image_path = None
+            if image_info and image_info.get('no_image'):
+                return self.apply_fallback(image_info)
+            if image_info and 'url' in image_info:
+                self.current_image_url = image_info['url']
+                log.info(f"Current image URL set: {self.current_image_url}")
+                # Downloads into the shared image store (once per image) and embeds metadata
+                image_path = self.download_image(self.current_image_url, image_info)
+                if not image_path:
+                    # Rejected, failed or refused by the breaker; never apply the raw URL instead
+                    return False, None
+            else:
+                log.warning("Failed to fetch the latest image info")
+                return False, None
+
+            # Apply wallpaper; only an applied (or deliberately not applied) image is a success,
+            # so a failed day is not recorded and the next check retries it
+            if self.settings["ENABLE_WALLPAPER"]:
+                log.info("Applying wallpaper...")
+                if not self.set_wallpaper(image_path):
+                    return False, None
+            else:
+                log.info("Wallpaper functionality disabled")
+                
+            return True, self.current_image_url
+        except Exception as e:
+            log.exception(f"Error updating wallpaper: {e}")
+            return False, None
+    
+    def enforce_retention(self):
+        """Evict old archive items per the retention settings, never the applied wallpaper"""
+        protected = [self.get_current_wallpaper()]
+        record = self.history.latest_applied()
+        if record:
+            protected.append(record.get('local_path'))
+        with span("retention"):
+            report = self.retention.run(protected=protected)
+            annotate(removed=report["removed"], bytes_reclaimed=report["bytes_reclaimed"])
+        if report["removed"] or report["temp_files"]:
+            log.info(f"Retention reclaimed {report['bytes_reclaimed']} bytes "
+                  f"({report['removed']} images, {report['temp_files']} temp files)")
+        return report
+
+    def record_last_update(self, image_url):
+        """Remember the last applied image URL and the update date"""
+        self.history.mark_applied(image_url)
+
+    def is_new_image_available(self):
+        """Check if a new image is available compared to what we have"""
+        try:
+            # Get the latest image info
+            image_info = self.get_latest_image_info()
+            if image_info and image_info.get('no_image'):
+                # The fallback counts as "new" once per non-image day
+                return (self.settings["NO_IMAGE_FALLBACK"] != "keep" and
+                        self.history.get_state("fallback_date") != image_info['date'])
+            if not image_info or 'url' not in image_info:
+                return False
+            
+            # Extract filename from URL
+            latest_filename = image_info['url'].split('/')[-1]
+            
+            # Check if we already have this image
+            current_wallpaper = self.get_current_wallpaper()
+            if current_wallpaper:
+                current_filename = os.path.basename(current_wallpaper)
+                
+                # If the current wallpaper is from our app and has the same filename, it's not new
+                if current_filename == latest_filename and os.path.dirname(current_wallpaper) == self.download_dir:
+                    return False
+            
+            # Also check if we have a record of the last applied image
+            if self.history.get_state("last_image_url") == image_info['url']:
+                return False
+            
+            # If we got here, a new image is available
+            return True
+        except Exception as e:
+            log.error(f"Error checking for new image: {e}")
+            return False
@@ -0,0 +1,209 @@
+import re
+import datetime
+import logging
+from html.parser import HTMLParser
+
+log = logging.getLogger("wall-y")
+
+# Start/end tags that implicitly close an open <p> (HTML5 parsing rules, trimmed to
+# what shows up on APOD pages)
+PARAGRAPH_BREAKS = {
+    'p', 'center', 'hr', 'div', 'table', 'ul', 'ol', 'dl', 'blockquote', 'pre',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'form', 'body', 'html',
+}
+
+# Tags that end the explanation: the credits/navigation block follows it
+EXPLANATION_ENDS = {'center', 'hr', 'table', 'body', 'html'}
+# Text that ends the explanation on pages without such a tag before it
+EXPLANATION_END_TEXT = "Tomorrow's picture"
+
+IMAGE_EXTENSIONS = ('.jpg', '.png')
+
+MONTHS = {name: number for number, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+
+
+class ParseError(Exception):
+    """The fast parser could not extract the page with confidence"""
+
+
+class _Done(Exception):
+    """Raised internally once every field has been found"""
+
+
+class APODPageParser(HTMLParser):
+    """Single-pass extractor for the title, explanation and hi-res image link
+
+    Only tracks the handful of tags that matter and stops tokenizing as soon
+    as all three fields are known. Paragraphs end where HTML5 would end them
+    (at the next <p> or block element). The explanation runs from the
+    paragraph holding "Explanation:" over any further paragraphs up to the
+    credits/navigation block (<center>, <hr>, "Tomorrow's picture"), so it
+    neither loses later paragraphs nor swallows the footer.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.explanation = None
+        self.image_href = None
+        self._title_parts = None
+        self._link_href = None
+        self._paragraph = None
+        self._explanation_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in PARAGRAPH_BREAKS:
+            self._end_paragraph()
+            if tag in EXPLANATION_ENDS:
+                self._end_explanation()
+            if tag == 'p':
+                self._paragraph = []
+        elif tag == 'title' and self.title is None:
+            self._title_parts = []
+        elif tag == 'a':
+            self._link_href = dict(attrs).get('href')
+        elif tag == 'img':
+            href = self._link_href
+            if self.image_href is None and href and href.endswith(IMAGE_EXTENSIONS):
+                self.image_href = href
+                self._check_done()
+
+    def handle_endtag(self, tag):
+        if tag in PARAGRAPH_BREAKS:
+            self._end_paragraph()
+            if tag in EXPLANATION_ENDS:
+                self._end_explanation()
+        elif tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_parts = None
+            self._check_done()
+        elif tag == 'a':
+            self._link_href = None
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self._explanation_parts is not None and EXPLANATION_END_TEXT in data:
+            self._end_paragraph()
+            self._end_explanation()
+        if self._paragraph is not None:
+            text = data.strip()
+            if text:
+                self._paragraph.append(text)
+
+    def _end_paragraph(self):
+        if self._paragraph is None:
+            return
+        text = ' '.join(self._paragraph)
+        self._paragraph = None
+        if self._explanation_parts is not None:
+            if text:
+                self._explanation_parts.append(text)
+            return
+        idx = text.find('Explanation:')
+        if self.explanation is None and idx != -1:
+            self._explanation_parts = [text[idx + len('Explanation:'):].strip()]
+
+    def _end_explanation(self):
+        if self._explanation_parts is None:
+            return
+        self.explanation = ' '.join(part for part in self._explanation_parts if part)
+        self._explanation_parts = None
+        self._check_done()
+
+    def _check_done(self):
+        if self.title is not None and self.explanation is not None and self.image_href is not None:
+            raise _Done()
+
+
+def parse_fast(html):
+    """Extract {'title', 'description', 'image_href'} with the fast parser
+
+    Raises ParseError when the page does not look like an APOD day page, so
+    the caller can fall back to the BeautifulSoup parser.
+    """
+    parser = APODPageParser()
+    try:
+        parser.feed(html)
+        parser.close()
+        parser._end_paragraph()
+        parser._end_explanation()
+    except _Done:
+        pass
+    except Exception as e:
+        raise ParseError(str(e))
+
+    if parser.explanation is None:
+        raise ParseError("no Explanation paragraph found")
+    return {
+        'title': parser.title,
+        'description': parser.explanation,
+        'image_href': parser.image_href,
+    }
+
+
+def parse_soup(html):
+    """Extract the same fields with BeautifulSoup (slow but forgiving)"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Get the title - it's typically in the center tag
+    title = None
+    title_elem = soup.find('title')
+    if title_elem:
+        title = title_elem.text.strip()
+
+    # Get the description/explanation
+    description = None
+    explanation = None
+    paragraphs = soup.find_all('p')
+    for p in paragraphs:
+        # Look for any tag or text containing 'Explanation:'
+        if p.find(string=lambda s: s and 'Explanation:' in s):
+            # Get all text after 'Explanation:'
+            full_text = p.get_text(separator=' ', strip=True)
+            idx = full_text.find('Explanation:')
+            if idx != -1:
+                explanation = full_text[idx + len('Explanation:'):].strip()
+                break
+    # Fallback: use the second paragraph as description if no explanation found
+    if not explanation and len(paragraphs) >= 2:
+        description = paragraphs[1].get_text(separator=' ', strip=True)
+    else:
+        description = explanation
+
+    # Find image link - typically it's an <a> tag with an <img> inside
+    image_href = None
+    for img_link in soup.find_all('a'):
+        if img_link.find('img'):
+            img_href = img_link.get('href')
+            if img_href and img_href.endswith(IMAGE_EXTENSIONS):
+                image_href = img_href
+                break
+
+    return {'title': title, 'description': description, 'image_href': image_href}
+
+
+def parse_title_date(title):
+    """'APOD: 2026 October 16 - The Tadpoles of IC 410' -> '2026-10-16' (None if absent)"""
+    match = re.search(r'(\d{4})\s+([A-Za-z]+)\s+(\d{1,2})', title or '')
+    if not match:
+        return None
+    # Month names are matched by hand; strptime's %B depends on the system locale
+    month = MONTHS.get(match.group(2)[:3].lower())
+    if not month:
+        return None
+    try:
+        return datetime.date(int(match.group(1)), month, int(match.group(3))).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_page(html):
+    """Parse an APOD day page, using the fast path and falling back to BeautifulSoup"""
+    try:
+        return parse_fast(html)
+    except ParseError as e:
+        log.warning(f"Fast APOD parser failed ({e}), falling back to BeautifulSoup")
+        return parse_soup(html)
@@ -1,69 +1,47 @@
+from startup_timing import StartupTimer
+# Started before the other imports so the report covers them
+startup = StartupTimer()
+
 import sys, os
-import datetime
-import requests
-import ctypes
-import re
-import traceback
-import socket
-from bs4 import BeautifulSoup
+if __name__ == "__main__":
+    # Variant worker processes of frozen builds re-enter here; they must not be forwarded
+    import multiprocessing
+    multiprocessing.freeze_support()
+    # The instance lock is taken before any other startup work. Whoever holds it
+    # is the running instance; it takes this launch's command (or "show") over its
+    # local control channel, and this process exits before Qt or the core are loaded
+    import control
+    _command = sys.argv[1:] if sys.argv[1:2] and sys.argv[1] in control.COMMANDS else []
+    _instance_lock = control.acquire_instance_lock()
+    if _instance_lock is None:
+        import time
+        # The holder may still be starting up and not listening yet
+        for _ in range(20):
+            _code = control.forward(_command)
+            if _code is not None:
+                sys.exit(_code)
+            time.sleep(0.5)
+        print("Another wall-y instance holds the lock but does not answer")
+        sys.exit(1)
+    if _command:
+        print("wall-y is not running")
+        sys.exit(1)
+
+import logging
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtWidgets import QSystemTrayIcon, QMenu, QAction, QMessageBox, QDialog, QVBoxLayout, QCheckBox, QPushButton, QTextBrowser, QLabel
-from PIL import Image, ExifTags
-from PIL.PngImagePlugin import PngInfo
-
-def load_settings(env_path=None):
-    settings = {}
-    # Try to find settings.env in the right place depending on frozen/script mode
-    possible_paths = []
-    if env_path:
-        possible_paths.append(env_path)
-    if getattr(sys, 'frozen', False):
-        # If frozen, look next to the executable (build output)
-        exe_dir = os.path.dirname(sys.executable)
-        possible_paths.append(os.path.join(exe_dir, "src", "settings.env"))
-        possible_paths.append(os.path.join(exe_dir, "settings.env"))
-    # Always try script dir (src/)
-    possible_paths.append(os.path.join(os.path.dirname(__file__), "settings.env"))
-
-    env_found = False
-    for path in possible_paths:
-        if os.path.exists(path):
-            env_found = True
-            with open(path, "r") as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        k, v = line.split('=', 1)
-                        settings[k.strip()] = v.strip()
-            break
-
-    if not env_found:
-        msg = ("ERROR: Could not find settings.env!\n" +
-               "Searched paths:\n" +
-               "\n".join(possible_paths) +
-               "\nPlease ensure settings.env is present next to the executable or in the src/ folder.")
-        print(msg)
-        sys.exit(1)
+# The Qt-free core: fetching, parsing, archiving and applying (also used by cli.py)
+from apod_core import APODWallpaper, load_settings
+from workers import UpdateEngine
+from telemetry import tracer, MetricsServer
+from scheduler import PublishScheduler
 
-    # Convert types
-    settings["DEBUG_MODE"] = settings.get("DEBUG_MODE", "False") == "True"
-    settings["ENABLE_WALLPAPER"] = settings.get("ENABLE_WALLPAPER", "True") == "True"
-    settings["ENABLE_SCREENSAVER"] = settings.get("ENABLE_SCREENSAVER", "False") == "True"
-    return settings
+log = logging.getLogger("wall-y")
 
-settings = load_settings()
+startup.mark("imports")
 
-# Single instance check
-def is_already_running():
-    """Check if another instance is already running using a socket"""
-    try:
-        # Try to create a socket on a specific port
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.bind(('localhost', 47200))  # Use a unique port number
-        sock.listen(1)
-        return False
-    except socket.error:
-        return True
+settings = load_settings()
+startup.mark("settings")
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for cx_Freeze """
@@ -71,7 +49,7 @@ def resource_path(relative_path):
         # If the application is run as a bundle (e.g., by cx_Freeze),
         # base_path is the directory of the executable.
         base_path = os.path.dirname(sys.executable)
-        print(f"Frozen mode: sys.executable dir: {base_path}")
+        log.info(f"Frozen mode: sys.executable dir: {base_path}")
         # In frozen mode, cx_Freeze copies files from 'include_files' to the root of the build_exe directory.
         # So, the icon will be alongside the executable, not in an 'assets' subfolder within the build.
     else:
@@ -82,366 +60,11 @@ def resource_path(relative_path):
         # os.path.dirname(os.path.dirname(__file__)) is project_root/
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         base_path = os.path.join(project_root, "assets") # Assuming icon is in project_root/assets
-        print(f"Development mode: assets dir: {base_path}")
+        log.info(f"Development mode: assets dir: {base_path}")
     resolved_path = os.path.join(base_path, relative_path.lstrip("assets/"))
-    print(f"Resolved resource path for '{relative_path}': {resolved_path}")
+    log.info(f"Resolved resource path for '{relative_path}': {resolved_path}")
     return resolved_path # Return the fully resolved path
 
-class APODWallpaper:
-    # [Rest of the APODWallpaper class remains unchanged]
-    def __init__(self):
-        # Use settings for URLs
-        self.base_url = settings["APOD_BASE_URL"]
-        self.archive_url = settings["APOD_ARCHIVE_URL"]
-        self.today_url = settings["APOD_TODAY_URL"]
-
-        # Set default download directory to wall-y under Pictures
-        pictures_dir = os.path.join(os.path.expanduser("~"), "Pictures")
-        self.download_dir = os.path.join(pictures_dir, "wall-y")
-        # Create download directory if it doesn't exist
-        if not os.path.exists(self.download_dir):
-            os.makedirs(self.download_dir)
-
-        # Debug logging
-        if settings["DEBUG_MODE"]:
-            print("Debug mode enabled")
-            print(f"Base URL: {self.base_url}")
-            print(f"Download directory: {self.download_dir}")
-
-        # Screensaver toggle
-        self.enable_screensaver = settings["ENABLE_SCREENSAVER"]
-
-        self.current_image_url = None
-        self.current_description = None
-        self.current_title = None
-    
-    def get_latest_image_info(self):
-        """Scrape the APOD today page to find the latest image URL and description"""
-        try:
-            response = requests.get(self.today_url, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Get the title - it's typically in the center tag
-            title = None
-            title_elem = soup.find('title')
-            if title_elem:
-                title = title_elem.text.strip()
-
-            # Get the description/explanation
-            description = None
-            explanation = None
-            paragraphs = soup.find_all('p')
-            for p in paragraphs:
-                # Look for any tag or text containing 'Explanation:'
-                if p.find(string=lambda s: s and 'Explanation:' in s):
-                    # Get all text after 'Explanation:'
-                    full_text = p.get_text(separator=' ', strip=True)
-                    idx = full_text.find('Explanation:')
-                    if idx != -1:
-                        explanation = full_text[idx + len('Explanation:'):].strip()
-                        break
-            # Fallback: use the second paragraph as description if no explanation found
-            if not explanation and len(paragraphs) >= 2:
-                description = paragraphs[1].get_text(separator=' ', strip=True)
-            else:
-                description = explanation
-
-            # Find image link - typically it's an <a> tag with an <img> inside
-            image_url = None
-            for img_link in soup.find_all('a'):
-                if img_link.find('img'):
-                    img_href = img_link.get('href')
-                    if img_href and (img_href.endswith('.jpg') or img_href.endswith('.png')):
-                        if img_href.startswith('http'):
-                            image_url = img_href
-                        else:
-                            image_url = self.base_url + img_href
-                        break
-
-            if image_url:
-                return {
-                    'url': image_url,
-                    'title': title,
-                    'description': description,
-                    'page_url': self.today_url,
-                    'date': datetime.datetime.now().strftime("%Y-%m-%d")
-                }
-
-            return None
-        except Exception as e:
-            print(f"Error getting latest image info: {e}")
-            traceback.print_exc()
-            return None
-    
-    def download_image(self, url, image_info):
-        """Download the image from the given URL"""
-        try:
-            response = requests.get(url, stream=True, timeout=30)
-            if response.status_code == 200:
-                # Extract filename from URL
-                filename = url.split('/')[-1]
-                filepath = os.path.join(self.download_dir, filename)
-                
-                # Save the image
-                with open(filepath, 'wb') as f:
-                    for chunk in response.iter_content(1024):
-                        f.write(chunk)
-                
-                # Verify the image can be opened
-                try:
-                    with Image.open(filepath) as img:
-                        # Check if image is valid and has reasonable dimensions
-                        if img.width < 800 or img.height < 600:
-                            print(f"Image dimensions too small: {img.width}x{img.height}")
-                            return None
-                        
-                        # Save metadata to the image
-                        if filename.lower().endswith('.jpg') or filename.lower().endswith('.jpeg'):
-                            # For JPEG, save as a new file with metadata
-                            self.save_metadata_to_jpeg(filepath, image_info)
-                        elif filename.lower().endswith('.png'):
-                            # For PNG, save metadata directly
-                            self.save_metadata_to_png(filepath, image_info)
-                        
-                        # Also save metadata to a separate text file with the same date
-                        self.save_metadata_to_file(image_info)
-                        
-                except Exception as e:
-                    print(f"Invalid image file: {e}")
-                    return None
-                
-                return filepath
-            else:
-                print(f"Failed to download image: {response.status_code}")
-                return None
-        except Exception as e:
-            print(f"Error downloading image: {e}")
-            traceback.print_exc()
-            return None
-    
-    def save_metadata_to_jpeg(self, filepath, image_info):
-        """Save metadata to JPEG image using EXIF"""
-        try:
-            # Create a copy of the image to add metadata
-            img = Image.open(filepath)
-            
-            # EXIF data must be added before saving
-            exif_data = img.getexif() if hasattr(img, 'getexif') else None
-            
-            if exif_data is not None:
-                # Add metadata to EXIF
-                exif_data[0x9286] = image_info.get('description', '')  # UserComment
-                exif_data[0x010e] = image_info.get('title', '')  # ImageDescription
-                exif_data[0x9003] = image_info.get('date', '')  # DateTimeOriginal
-                
-                # Save with EXIF data
-                img.save(filepath, exif=exif_data)
-            else:
-                print("EXIF data not supported for this image")
-            
-            img.close()
-        except Exception as e:
-            print(f"Error saving metadata to JPEG: {e}")
-    
-    def save_metadata_to_png(self, filepath, image_info):
-        """Save metadata to PNG image"""
-        try:
-            # Open the image
-            img = Image.open(filepath)
-            
-            # Create PNG info object
-            metadata = PngInfo()
-            
-            # Add metadata
-            metadata.add_text("Title", image_info.get('title', ''))
-            metadata.add_text("Description", image_info.get('description', ''))
-            metadata.add_text("Date", image_info.get('date', ''))
-            
-            # Save with metadata
-            img.save(filepath, pnginfo=metadata)
-            img.close()
-        except Exception as e:
-            print(f"Error saving metadata to PNG: {e}")
-    
-    def save_metadata_to_file(self, image_info):
-        """Save metadata to a text file with the date in the filename"""
-        try:
-            date_str = image_info.get('date', datetime.datetime.now().strftime("%Y-%m-%d"))
-            metadata_file = os.path.join(self.download_dir, f"apod_{date_str}.txt")
-            
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                f.write(f"Title: {image_info.get('title', '')}\n\n")
-                f.write(f"Date: {date_str}\n\n")
-                f.write(f"Description: {image_info.get('description', '')}\n\n")
-                f.write(f"URL: {image_info.get('page_url', '')}")
-        except Exception as e:
-            print(f"Error saving metadata to file: {e}")
-    
-    def read_metadata_from_image(self, image_path):
-        """Read metadata from an image file"""
-        try:
-            if not os.path.exists(image_path):
-                return None
-            
-            img = Image.open(image_path)
-            metadata = {}
-            
-            if image_path.lower().endswith(('.jpg', '.jpeg')):
-                # Read EXIF data from JPEG
-                exif_data = img.getexif() if hasattr(img, 'getexif') else None
-                if exif_data:
-                    metadata['description'] = exif_data.get(0x9286, '')  # UserComment
-                    metadata['title'] = exif_data.get(0x010e, '')  # ImageDescription
-                    metadata['date'] = exif_data.get(0x9003, '')  # DateTimeOriginal
-            
-            elif image_path.lower().endswith('.png'):
-                # Read metadata from PNG
-                if 'Title' in img.info:
-                    metadata['title'] = img.info['Title']
-                if 'Description' in img.info:
-                    metadata['description'] = img.info['Description']
-                if 'Date' in img.info:
-                    metadata['date'] = img.info['Date']
-            
-            img.close()
-            return metadata
-        except Exception as e:
-            print(f"Error reading metadata from image: {e}")
-            return None
-    
-    def set_wallpaper(self, image_url):
-        """Download the image if needed and set as wallpaper using the local file path."""
-        import ctypes
-        import requests
-        import os
-        if image_url.startswith("http"):
-            local_path = os.path.join(self.download_dir, os.path.basename(image_url))
-            try:
-                response = requests.get(image_url, stream=True)
-                if response.status_code == 200:
-                    with open(local_path, 'wb') as f:
-                        for chunk in response.iter_content(1024):
-                            f.write(chunk)
-                    print(f"Downloaded wallpaper to: {local_path}")
-                else:
-                    print(f"Failed to download image: {response.status_code}")
-                    return False
-            except Exception as e:
-                print(f"Error downloading wallpaper: {e}")
-                return False
-        else:
-            local_path = image_url
-        try:
-            ctypes.windll.user32.SystemParametersInfoW(20, 0, local_path, 3)
-            print(f"Wallpaper set successfully: {local_path}")
-            return True
-        except Exception as e:
-            print(f"Error setting wallpaper: {e}")
-            return False
-    
-    def set_screensaver_wallpaper(self, image_url):
-        """Download the image if needed and prompt user to set as lock screen wallpaper manually."""
-        import os
-        import requests
-        import subprocess
-        from PyQt5.QtWidgets import QMessageBox
-        if image_url.startswith("http"):
-            local_path = os.path.join(self.download_dir, "lockscreen_wallpaper.jpg")
-            try:
-                response = requests.get(image_url, stream=True)
-                if response.status_code == 200:
-                    with open(local_path, 'wb') as f:
-                        for chunk in response.iter_content(1024):
-                            f.write(chunk)
-                    print(f"Downloaded lock screen wallpaper to: {local_path}")
-                else:
-                    print(f"Failed to download image: {response.status_code}")
-                    return False
-            except Exception as e:
-                print(f"Error downloading lock screen wallpaper: {e}")
-                return False
-        else:
-            local_path = image_url
-        # Open Windows lock screen settings
-        try:
-            subprocess.run(["start", "ms-settings:lockscreen"], shell=True)
-            QMessageBox.information(None, "Lock Screen Wallpaper", f"Lock screen wallpaper downloaded to:\n{local_path}\n\nPlease set it manually in Windows Settings.")
-            return True
-        except Exception as e:
-            print(f"Error opening lock screen settings: {e}")
-            return False
-
-    def get_current_wallpaper(self):
-        """Get the path of the current wallpaper"""
-        try:
-            import winreg
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Control Panel\Desktop")
-            wallpaper_path = winreg.QueryValueEx(key, "WallPaper")[0]
-            winreg.CloseKey(key)
-            return wallpaper_path
-        except Exception as e:
-            print(f"Error getting current wallpaper: {e}")
-            return None
-    
-    def update_wallpaper(self):
-        """Main function to update the wallpaper"""
-        try:
-            # Ensure current_image_url is set when fetching the latest image
-            image_info = self.get_latest_image_info()
-            if image_info and 'url' in image_info:
-                self.current_image_url = image_info['url']
-                print(f"Current image URL set: {self.current_image_url}")
-            else:
-                print("Failed to fetch the latest image info")
-
-            # Apply wallpaper
-            if settings["ENABLE_WALLPAPER"]:
-                print("Applying wallpaper...")
-                self.set_wallpaper(self.current_image_url)
-            else:
-                print("Wallpaper functionality disabled")
-                
-            return True, self.current_image_url
-        except Exception as e:
-            print(f"Error updating wallpaper: {e}")
-            traceback.print_exc()
-            return False, None
-    
-    def is_new_image_available(self):
-        """Check if a new image is available compared to what we have"""
-        try:
-            # Get the latest image info
-            image_info = self.get_latest_image_info()
-            if not image_info or 'url' not in image_info:
-                return False
-            
-            # Extract filename from URL
-            latest_filename = image_info['url'].split('/')[-1]
-            
-            # Check if we already have this image
-            current_wallpaper = self.get_current_wallpaper()
-            if current_wallpaper:
-                current_filename = os.path.basename(current_wallpaper)
-                
-                # If the current wallpaper is from our app and has the same filename, it's not new
-                if current_filename == latest_filename and os.path.dirname(current_wallpaper) == self.download_dir:
-                    return False
-            
-            # Also check if we have a record of the last downloaded image
-            last_image_file = os.path.join(self.download_dir, "last_image.txt")
-            if os.path.exists(last_image_file):
-                with open(last_image_file, 'r') as f:
-                    last_image_url = f.read().strip()
-                    if last_image_url == image_info['url']:
-                        return False
-            
-            # If we got here, a new image is available
-            return True
-        except Exception as e:
-            print(f"Error checking for new image: {e}")
-            return False
-
-
 class DescriptionDialog(QDialog):
     def __init__(self, title, description, parent=None):
         super().__init__(parent)
@@ -552,14 +175,13 @@ class SettingsDialog(QDialog):
                 # If running as script
                 file_path = os.path.abspath(sys.argv[0])
                 
-            print(f"Adding to startup: {file_path}")
+            log.info(f"Adding to startup: {file_path}")
             key = reg.OpenKey(reg.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Run", 0, reg.KEY_SET_VALUE)
             reg.SetValueEx(key, "APODWallpaper", 0, reg.REG_SZ, file_path)
             reg.CloseKey(key)
             return True
         except Exception as e:
-            print(f"Error adding to startup: {e}")
-            traceback.print_exc()
+            log.exception(f"Error adding to startup: {e}")
             return False
     
     def remove_from_startup(self):
@@ -571,7 +193,7 @@ class SettingsDialog(QDialog):
             reg.CloseKey(key)
             return True
         except Exception as e:
-            print(f"Error removing from startup: {e}")
+            log.error(f"Error removing from startup: {e}")
             return False
 
 
@@ -579,9 +201,27 @@ class SystemTrayApp(QtWidgets.QApplication):
     def __init__(self, argv):
         super().__init__(argv)
         self.setQuitOnLastWindowClosed(False)
+
+        # Commands from later launches, `wall-y tray ...` and scripts (see control.py).
+        # Started first: an instance that cannot own the channel must not run at all
+        from control_server import ControlServer
+        self.control = ControlServer(self.handle_command, self)
+        if not self.control.start():
+            sys.exit(1)
         
         # Initialize wallpaper handler
-        self.wallpaper = APODWallpaper()
+        self.wallpaper = APODWallpaper(settings)
+
+        # Network and image work runs on a thread pool; the UI only reacts to signals
+        self.engine = UpdateEngine(self.wallpaper, self)
+        self.aboutToQuit.connect(self.engine.shutdown)
+        self.aboutToQuit.connect(self.wallpaper.shutdown_variant_pool)
+
+        # Per-phase counters for ops, on 127.0.0.1 only
+        self.metrics_server = None
+        if settings["METRICS_PORT"]:
+            self.metrics_server = MetricsServer(tracer, settings["METRICS_PORT"])
+            self.metrics_server.start()
         
         # Create system tray icon
         self.tray = QSystemTrayIcon(self) # Pass parent
@@ -589,20 +229,21 @@ class SystemTrayApp(QtWidgets.QApplication):
         # --- Robust Icon Loading ---
         icon_path = resource_path("assets/wall-y-round.ico")
         if os.path.exists(icon_path):
-            print(f"Attempting to load icon from: {icon_path}")
+            log.info(f"Attempting to load icon from: {icon_path}")
             app_icon = QtGui.QIcon(icon_path) # Simpler way to load if path is correct
             
             if app_icon.isNull():
-                print(f"Warning: Icon at {icon_path} loaded but isNull() returned True. File might be invalid or unreadable by Qt. Using fallback.")
+                log.warning(f"Icon at {icon_path} loaded but isNull() returned True. File might be invalid or unreadable by Qt. Using fallback.")
                 self._set_fallback_icon()
             else:
                 self.tray.setIcon(app_icon)
                 self.setWindowIcon(app_icon) 
         else:
-            print(f"Icon file not found at {icon_path}, using fallback icon.")
+            log.warning(f"Icon file not found at {icon_path}, using fallback icon.")
             self._set_fallback_icon()
         # --- End Icon Loading ---
 
+        self.tray.setToolTip("APOD Wallpaper")
         self.tray.setVisible(True)
         
         # Create menu with better size (1/6th of screen width)
@@ -610,10 +251,24 @@ class SystemTrayApp(QtWidgets.QApplication):
         screen_size = QtWidgets.QDesktopWidget().screenGeometry()
         menu_width = screen_size.width() // 6  # 1/6th of screen width
         self.menu.setFixedWidth(menu_width)
+
+        # Wallpapers are pre-scaled to the screen in physical pixels
+        pixel_ratio = self.primaryScreen().devicePixelRatio() if self.primaryScreen() else 1.0
+        self.wallpaper.screen_size = (int(screen_size.width() * pixel_ratio),
+                                      int(screen_size.height() * pixel_ratio))
+        # Every monitor gets its own crop; re-apply when the layout changes
+        self.wallpaper.set_monitors(self.monitor_layout())
+        self.screenAdded.connect(self.on_screens_changed)
+        self.screenRemoved.connect(self.on_screens_changed)
+        self._watched_screens = set()
+        self._watch_screens()
         
         # Add actions
         self.open_folder_action = QAction("Open Wallpapers Folder")
         self.open_folder_action.triggered.connect(self.open_wallpapers_folder)
+        self.gallery_action = QAction("Browse Past Images...")
+        self.gallery_action.triggered.connect(self.show_gallery)
+        self.gallery = None
         self.settings_action = QAction("Settings")
         self.settings_action.triggered.connect(self.show_settings)
         self.exit_action = QAction("Exit")
@@ -622,6 +277,13 @@ class SystemTrayApp(QtWidgets.QApplication):
         self.update_action = QAction("Update Wallpaper Now")
         self.update_action.triggered.connect(self.manual_update)
         self.menu.addAction(self.update_action)
+
+        # Favorites are exempt from eviction under RETENTION_POLICY=favorites
+        self.favorite_action = QAction("Keep This Wallpaper")
+        self.favorite_action.setCheckable(True)
+        self.favorite_action.toggled.connect(self.toggle_favorite)
+        self.menu.addAction(self.favorite_action)
+        self.menu.aboutToShow.connect(self.refresh_favorite_action)
         
         # --- QWidgetAction for Description Preview ---
         self.description_preview_label = QLabel("Loading description...")
@@ -647,21 +309,39 @@ class SystemTrayApp(QtWidgets.QApplication):
 
         # Move buttons to the last rows
         self.menu.addSeparator()
+        self.menu.addAction(self.gallery_action)
         self.menu.addAction(self.open_folder_action)
         self.menu.addAction(self.settings_action)
         self.menu.addAction(self.exit_action)
         
         # Set the menu
         self.tray.setContextMenu(self.menu)
+
+        self.progress_message = ""
+        self.engine.progress.connect(self.on_progress)
+        # Breaker state changes on pool threads; show it whenever a job ends
+        self.engine.update_finished.connect(self.refresh_tooltip)
+        self.engine.failed.connect(self.refresh_tooltip)
+        self.engine.scheduled_check_finished.connect(self.refresh_tooltip)
+        self.engine.info_ready.connect(self.on_info_ready)
+        self.engine.info_unavailable.connect(self.load_current_description)
+        self.engine.update_finished.connect(self.on_update_finished)
+        self.engine.failed.connect(self.on_update_failed)
         
-        # Set up timer for checking at midnight ET (6:00 AM CEST)
-        self.timer = QtCore.QTimer(self)
-        self.timer.timeout.connect(self.check_scheduled_update)
-        
-        # Start timer - check every 15 minutes
-        self.timer.start(15 * 60 * 1000)  # 15 minutes in milliseconds
-        
-        # Initial check - always check for new image on startup
+        # Check only around APOD's publish time (midnight US Eastern), not on a fixed poll
+        self.scheduler = PublishScheduler(self.wallpaper.history, self, settings=settings)
+        self.scheduler.check_due.connect(self.check_scheduled_update)
+        self.engine.info_ready.connect(self.scheduler.on_info)
+        self.engine.update_finished.connect(self.scheduler.on_update_finished)
+        self.engine.scheduled_check_finished.connect(self.scheduler.on_check_finished)
+        self.scheduler.start()
+
+        self.engine.day_ready.connect(self.apply_past_day)
+
+        # Offline first: show the last known description from local state before any network I/O
+        self.load_cached_description()
+
+        # Initial check - always check for new image on startup; it revalidates the cached text
         QtCore.QTimer.singleShot(1000, self.initial_check)
 
     def _set_fallback_icon(self):
@@ -671,70 +351,139 @@ class SystemTrayApp(QtWidgets.QApplication):
         fallback_icon = QtGui.QIcon(pixmap)
         self.tray.setIcon(fallback_icon)
         self.setWindowIcon(fallback_icon)
-        print("Fallback icon (blue square) has been set.")
+        log.info("Fallback icon (blue square) has been set.")
 
     
+    def monitor_layout(self):
+        """[{name, x, y, width, height}] for every screen, in physical pixels"""
+        monitors = []
+        for index, screen in enumerate(self.screens()):
+            geometry = screen.geometry()
+            ratio = screen.devicePixelRatio()
+            monitors.append({
+                'name': screen.name() or f"screen{index}",
+                'x': int(geometry.x() * ratio),
+                'y': int(geometry.y() * ratio),
+                'width': int(geometry.width() * ratio),
+                'height': int(geometry.height() * ratio),
+            })
+        return monitors
+
+    def _watch_screens(self):
+        # Forget unplugged screens so a re-plugged one is connected again
+        self._watched_screens &= {screen.name() for screen in self.screens()}
+        for screen in self.screens():
+            if screen.name() not in self._watched_screens:
+                self._watched_screens.add(screen.name())
+                screen.geometryChanged.connect(self.on_screens_changed)
+
+    def on_screens_changed(self, *args):
+        """Monitors were added, removed or resized: re-apply the current image for the new layout"""
+        self._watch_screens()
+        if not self.wallpaper.set_monitors(self.monitor_layout()):
+            return
+        record = self.wallpaper.history.latest_applied()
+        if settings["ENABLE_WALLPAPER"] and record and record.get('local_path'):
+            self.engine.apply(record['local_path'])
+
     def initial_check(self):
-        """Check for new images and update description on startup"""
-        # Always fetch latest description first
-        try:
-            image_info = self.wallpaper.get_latest_image_info()
-            if image_info:
-                self.wallpaper.current_description = image_info.get('description', '')
-                self.wallpaper.current_title = image_info.get('title', 'NASA APOD')
-                self.update_description_preview()
+        """Check for new images and update description on startup (in the background)"""
+        self.engine.initial_check()
+
+    def on_info_ready(self, image_info):
+        """Show freshly fetched image info in the menu, if it differs from what is shown"""
+        if image_info.get('no_image'):
+            # The menu describes the wallpaper, which is a fallback image on these days
+            return
+        title = image_info.get('title', 'NASA APOD')
+        description = image_info.get('description', '')
+        if title == self.wallpaper.current_title and description == self.wallpaper.current_description:
+            return
+        self.wallpaper.current_description = description
+        self.wallpaper.current_title = title
+        self.update_description_preview()
+
+    def on_progress(self, message):
+        """Reflect background job status in the tray tooltip"""
+        self.progress_message = message
+        self.refresh_tooltip()
+
+    def refresh_tooltip(self, *args):
+        """Running job, else the upstream circuit breaker's state when it is not closed"""
+        message = self.progress_message or self.wallpaper.breaker.describe()
+        self.tray.setToolTip(f"APOD Wallpaper - {message}" if message else "APOD Wallpaper")
+
+    def on_update_finished(self, success, image_url, show_notification):
+        """React to a finished background update"""
+        self.update_action.setEnabled(True)
+        if success:
+            if show_notification:
+                self.tray.showMessage("APOD Wallpaper", "Wallpaper updated successfully!", QSystemTrayIcon.Information, 3000)
+            # Update description in menu
+            self.update_description_preview()
+        elif show_notification:
+            message = self.wallpaper.breaker.describe() or "Failed to update wallpaper."
+            self.tray.showMessage("APOD Wallpaper", message, QSystemTrayIcon.Critical, 3000)
+
+    def on_update_failed(self, error, show_notification):
+        """React to a background job that raised"""
+        self.update_action.setEnabled(True)
+        if show_notification:
+            self.tray.showMessage("APOD Wallpaper", f"Error updating wallpaper: {error}", QSystemTrayIcon.Critical, 3000)
 
-                # Check if we need to update the wallpaper
-                if self.wallpaper.is_new_image_available():
-                    self.check_for_update(show_notification=True)
-            else:
-                # Fallback: try loading from local files
-                self.load_current_description()
-        except Exception as e:
-            print(f"Error in initial check: {e}")
-            traceback.print_exc()
-            self.load_current_description()  # Fallback to local files
-    
     def load_current_description(self):
-        """Load the current description from the current wallpaper or file"""
+        """Show the description from local state, fetching it only if nothing is stored"""
+        if not self.load_cached_description():
+            self.fetch_description()
+
+    def load_cached_description(self):
+        """Show the description from the history index or the current wallpaper (no network)
+
+        Returns True if a description was found.
+        """
         try:
-            # First try to get the current wallpaper path
+            history = self.wallpaper.history
             current_wallpaper = self.wallpaper.get_current_wallpaper()
+
+            # Prefer the indexed record for the current wallpaper, then the last applied / latest day
+            record = history.get_by_path(current_wallpaper) if current_wallpaper else None
+            record = record or history.latest_applied() or history.latest()
+            if record and record.get('description'):
+                self.wallpaper.current_title = record.get('title') or 'NASA APOD'
+                self.wallpaper.current_description = record['description']
+                self.update_description_preview()
+                return True
+
+            # Not indexed: try reading metadata embedded in the wallpaper image
             if current_wallpaper and os.path.exists(current_wallpaper):
-                # Try to read metadata from the image
                 metadata = self.wallpaper.read_metadata_from_image(current_wallpaper)
                 if metadata and 'description' in metadata and metadata['description']:
                     self.wallpaper.current_description = metadata['description']
                     self.wallpaper.current_title = metadata.get('title', 'NASA APOD')
                     self.update_description_preview()
-                    return
-            
-            # If we couldn't get metadata from the image, try the latest text file
-            files = [f for f in os.listdir(self.wallpaper.download_dir) if f.startswith('apod_') and f.endswith('.txt')]
-            if files:
-                # Sort by date (which is in the filename)
-                files.sort(reverse=True)
-                latest_file = os.path.join(self.wallpaper.download_dir, files[0])
-                
-                with open(latest_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    title_match = re.search(r'Title: (.*?)\n', content)
-                    desc_match = re.search(r'Description: (.*?)(?:\n\n|$)', content, re.DOTALL)
-                    
-                    if title_match:
-                        self.wallpaper.current_title = title_match.group(1)
-                    if desc_match:
-                        self.wallpaper.current_description = desc_match.group(1)
-                    
-                    self.update_description_preview()
-                    return
-            
-            # If all else fails, fetch from the website
-            self.fetch_description()
+                    return True
         except Exception as e:
-            print(f"Error loading description: {e}")
-            traceback.print_exc()
+            log.exception(f"Error loading description: {e}")
+        return False
     
+    def current_record(self):
+        """History row of the wallpaper that is applied now"""
+        current_wallpaper = self.wallpaper.get_current_wallpaper()
+        record = self.wallpaper.history.get_by_path(current_wallpaper) if current_wallpaper else None
+        return record or self.wallpaper.history.latest_applied()
+
+    def refresh_favorite_action(self):
+        record = self.current_record()
+        self.favorite_action.blockSignals(True)
+        self.favorite_action.setEnabled(record is not None)
+        self.favorite_action.setChecked(bool(record and record.get('favorite')))
+        self.favorite_action.blockSignals(False)
+
+    def toggle_favorite(self, checked):
+        record = self.current_record()
+        if record:
+            self.wallpaper.history.set_favorite(record['date'], checked)
+
     def get_preview_text(self, text, max_words=200):
         """Get a preview of the text with a much larger number of words (or full text)"""
         if not text:
@@ -764,84 +513,21 @@ class SystemTrayApp(QtWidgets.QApplication):
             dialog.exec_()
     
     def fetch_description(self):
-        """Fetch the description from the website"""
-        try:
-            image_info = self.wallpaper.get_latest_image_info()
-            if image_info:
-                self.wallpaper.current_title = image_info.get('title', 'NASA APOD')
-                self.wallpaper.current_description = image_info.get('description', 'No description available')
-                self.update_description_preview()
-                
-                # Save description to file
-                self.wallpaper.save_metadata_to_file(image_info)
-        except Exception as e:
-            print(f"Error fetching description: {e}")
-            traceback.print_exc()
-    
-    def is_update_time(self):
-        """Check if it's time to update based on midnight ET (6:00 AM CEST)"""
-        # APOD updates daily, typically around midnight US Eastern Time.
-        # Midnight ET is ~04:00-05:00 UTC depending on DST.
-        # This check is a general window. is_new_image_available() is more definitive.
-        now_utc = datetime.datetime.utcnow()
-        # Check if current UTC hour is in a window that's likely post-midnight ET.
-        # e.g., 4, 5, 6 UTC (covers midnight to 2 AM ET approx)
-        return now_utc.hour in [4, 5, 6]
+        """Fetch the description from the website (in the background)"""
+        self.engine.fetch_description()
     
     def check_scheduled_update(self):
-        """Check if it's time for scheduled update"""
-        if self.is_update_time() or self.wallpaper.is_new_image_available():
-            self.check_for_update()
+        """Scheduled check requested by the publish-time scheduler"""
+        self.engine.check_scheduled()
     
     def check_for_update(self, show_notification=True):
-        """Check if we need to update the wallpaper"""
-        try:
-            success, image_path = self.wallpaper.update_wallpaper()
-            if success:
-                if show_notification:
-                    self.tray.showMessage("APOD Wallpaper", "Wallpaper updated successfully!", QSystemTrayIcon.Information, 3000)
-                
-                # Update description in menu
-                self.update_description_preview()
-                
-                # Save the current image URL
-                last_image_file = os.path.join(self.wallpaper.download_dir, "last_image.txt")
-                with open(last_image_file, 'w') as f:
-                    f.write(self.wallpaper.current_image_url)
-                
-                # Update last update time
-                last_update_file = os.path.join(self.wallpaper.download_dir, "last_update.txt")
-                with open(last_update_file, 'w') as f:
-                    f.write(datetime.datetime.now().strftime("%Y-%m-%d"))
-            elif show_notification:
-                self.tray.showMessage("APOD Wallpaper", "Failed to update wallpaper.", QSystemTrayIcon.Critical, 3000)
-        except Exception as e:
-            if show_notification:
-                self.tray.showMessage("APOD Wallpaper", f"Error updating wallpaper: {str(e)}", QSystemTrayIcon.Critical, 3000)
+        """Update the wallpaper in the background"""
+        self.engine.update(show_notification)
     
     def manual_update(self):
         """Manually update the wallpaper"""
-        try:
-            success, image_path = self.wallpaper.update_wallpaper()
-            if success:
-                self.tray.showMessage("APOD Wallpaper", "Wallpaper updated successfully!", QSystemTrayIcon.Information, 3000)
-                
-                # Update description in menu
-                self.update_description_preview()
-                
-                # Save the current image URL
-                last_image_file = os.path.join(self.wallpaper.download_dir, "last_image.txt")
-                with open(last_image_file, 'w') as f:
-                    f.write(self.wallpaper.current_image_url)
-                
-                # Update last update time
-                last_update_file = os.path.join(self.wallpaper.download_dir, "last_update.txt")
-                with open(last_update_file, 'w') as f:
-                    f.write(datetime.datetime.now().strftime("%Y-%m-%d"))
-            else:
-                self.tray.showMessage("APOD Wallpaper", "Failed to update wallpaper.", QSystemTrayIcon.Critical, 3000)
-        except Exception as e:
-            self.tray.showMessage("APOD Wallpaper", f"Error: {str(e)}", QSystemTrayIcon.Critical, 3000)
+        self.update_action.setEnabled(False)
+        self.engine.update(show_notification=True)
     
     def open_wallpapers_folder(self):
         """Open the wallpapers folder in explorer"""
@@ -850,6 +536,56 @@ class SystemTrayApp(QtWidgets.QApplication):
         except Exception as e:
             self.tray.showMessage("APOD Wallpaper", f"Error opening folder: {str(e)}", QSystemTrayIcon.Critical, 3000)
     
+    def show_gallery(self):
+        """Open the gallery of archived days (built on first use)"""
+        if self.gallery is None:
+            from gallery import GalleryWindow
+            self.gallery = GalleryWindow(self.wallpaper.history, self.wallpaper.thumbs_dir)
+            self.gallery.apply_requested.connect(self.apply_past_day)
+        self.gallery.show()
+        self.gallery.raise_()
+        self.gallery.activateWindow()
+
+    def apply_past_day(self, record):
+        """Set an archived day as the wallpaper straight from disk"""
+        self.wallpaper.current_title = record.get('title') or 'NASA APOD'
+        self.wallpaper.current_description = record.get('description') or ''
+        self.update_description_preview()
+        self.engine.apply(record['local_path'], record.get('url'))
+
+    def handle_command(self, command, args):
+        """Reply to a control channel command (runs on the GUI thread)"""
+        if command == "show":
+            self.tray.showMessage("APOD Wallpaper", "APOD Wallpaper is already running in the system tray.",
+                                  QSystemTrayIcon.Information, 3000)
+            return {"ok": True, "message": "already running"}
+        if command == "update-now":
+            if not self.update_action.isEnabled():
+                return {"ok": True, "message": "update already running"}
+            self.manual_update()
+            return {"ok": True, "message": "update started"}
+        if command == "apply":
+            if not args:
+                return {"ok": False, "error": "usage: apply YYYY-MM-DD"}
+            record = self.wallpaper.history.get_by_date(args)
+            if record and record.get('local_path') and os.path.exists(record['local_path']):
+                self.apply_past_day(record)
+                return {"ok": True, "message": f"applying {args}"}
+            self.engine.fetch_day(args)
+            return {"ok": True, "message": f"fetching {args}"}
+        history = self.wallpaper.history
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "title": self.wallpaper.current_title,
+            "wallpaper": self.wallpaper.get_current_wallpaper(),
+            "last_applied": (history.latest_applied() or {}).get('date'),
+            "last_update": history.get_state("last_update"),
+            "updating": not self.update_action.isEnabled(),
+            "status": self.tray.toolTip(),
+            "upstream": self.wallpaper.breaker.status(),
+        }
+
     def show_settings(self):
         """Show settings dialog"""
         dialog = SettingsDialog()
@@ -857,29 +593,35 @@ class SystemTrayApp(QtWidgets.QApplication):
 
 
 if __name__ == "__main__":
-    # Check if another instance is already running
-    if is_already_running():
-        app = QtWidgets.QApplication(sys.argv)
-        QMessageBox.warning(None, "APOD Wallpaper", 
-                           "Another instance of APOD Wallpaper is already running.\n"
-                           "Please check your system tray for the running application.")
+    app = QtWidgets.QApplication(sys.argv)
+    startup.mark("qt_ready")
+    if settings["SETTINGS_PATH"] is None:
+        QMessageBox.critical(None, "APOD Wallpaper",
+                             "Could not find settings.env.\n"
+                             "Please ensure settings.env is present next to the executable or in the src/ folder.")
         sys.exit(1)
-    else:
-        app = QtWidgets.QApplication(sys.argv)
-        # --- Splash Screen ---
-        splash_pix = QtGui.QPixmap(resource_path("assets/wall-y-round.ico"))
-        if splash_pix.isNull():
-            # fallback: blue square
-            splash_pix = QtGui.QPixmap(128, 128)
-            splash_pix.fill(QtGui.QColor("blue"))
-        splash = QtWidgets.QSplashScreen(splash_pix)
-        splash.showMessage("Starting wall-y...", QtCore.Qt.AlignBottom | QtCore.Qt.AlignCenter, QtCore.Qt.white)
-        splash.show()
-        app.processEvents()
-        # Simulate loading (or do real init)
-        import time
-        time.sleep(1)  # Optional: show splash for at least 1s
-        # --- End Splash Screen ---
-        tray_app = SystemTrayApp(sys.argv)
-        splash.close()
-        sys.exit(tray_app.exec_())
\ No newline at end of file
+    # --- Splash Screen ---
+    splash_pix = QtGui.QPixmap(resource_path("assets/wall-y-round.ico"))
+    if splash_pix.isNull():
+        # fallback: blue square
+        splash_pix = QtGui.QPixmap(128, 128)
+        splash_pix.fill(QtGui.QColor("blue"))
+    splash = QtWidgets.QSplashScreen(splash_pix)
+    splash.showMessage("Starting wall-y...", QtCore.Qt.AlignBottom | QtCore.Qt.AlignCenter, QtCore.Qt.white)
+    splash.show()
+    app.processEvents()
+    startup.mark("splash")
+    # --- End Splash Screen ---
+    tray_app = SystemTrayApp(sys.argv)
+    splash.close()
+    startup.mark("tray")
+
+    def startup_done():
+        # First pass of the event loop: the tray icon has been painted
+        startup.mark("first_paint")
+        report = startup.write(os.path.join(tray_app.wallpaper.cache_dir, "startup_timings.jsonl"))
+        if settings["DEBUG_MODE"]:
+            log.info(f"Startup took {report['total_ms']} ms: {report['phases']}")
+
+    QtCore.QTimer.singleShot(0, startup_done)
+    sys.exit(tray_app.exec_())
@@ -0,0 +1,175 @@
+import re
+import sys
+import time
+import argparse
+import datetime
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from apod_core import APODWallpaper
+from apod_parser import parse_page
+from http_session import create_session
+
+# e.g. '2024 October 16:  <a href="ap241016.html">NGC 6946: The Fireworks Galaxy</a><br>'
+ARCHIVE_ENTRY = re.compile(
+    r'(\d{4})\s+([A-Za-z]+)\s+(\d{1,2})\s*:\s*<a\s+href="(ap(\d{6})\.html)">(.*?)</a>',
+    re.IGNORECASE | re.DOTALL)
+
+
+class RateLimiter:
+    """Spaces requests from all worker threads at least 1/rate seconds apart"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def page_date(page_name):
+    """'ap241016.html' -> '2024-10-16' (APOD started in 1995)"""
+    yymmdd = re.search(r'ap(\d{6})', page_name).group(1)
+    year = int(yymmdd[:2])
+    year += 1900 if year >= 95 else 2000
+    return f"{year:04d}-{yymmdd[2:4]}-{yymmdd[4:6]}"
+
+
+def parse_archive(html, base_url):
+    """Return [{'date', 'page_url', 'title'}] for every day listed in the archive index"""
+    days = []
+    for match in ARCHIVE_ENTRY.finditer(html):
+        page_name = match.group(4)
+        days.append({
+            'date': page_date(page_name),
+            'page_url': base_url + page_name,
+            'title': re.sub(r'\s+', ' ', match.group(6)).strip(),
+        })
+    return days
+
+
+class Backfill:
+    """Download a range of past APOD days concurrently, resumably and politely"""
+
+    def __init__(self, wallpaper, workers=4, rate=2.0):
+        self.wallpaper = wallpaper
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+
+        # One pooled session shared by every worker thread, sized to the pool. It
+        # reports to the wallpaper's breaker; once that opens the run stops
+        # fetching and leaves the remaining days for a later run
+        self.session = create_session(wallpaper.settings, pool_size=max(workers, 1),
+                                      breaker=wallpaper.breaker)
+        self.wallpaper.session = self.session
+        self.wallpaper.image_store.session = self.session
+        # Index writes are batched during the run and flushed at the end
+        self.wallpaper.image_store.save_interval = 5
+        self._stop = threading.Event()
+
+    def list_days(self, start=None, end=None):
+        """Fetch the archive index and return the days in [start, end] (ISO dates)"""
+        self.limiter.wait()
+        response = self.session.get(self.wallpaper.archive_url)
+        response.raise_for_status()
+        days = parse_archive(response.text, self.wallpaper.base_url)
+        return [d for d in days
+                if (not start or d['date'] >= start) and (not end or d['date'] <= end)]
+
+    def run(self, start=None, end=None, progress=None):
+        """Backfill the range; days finished by an earlier run are skipped
+
+        Returns a dict of counts per outcome. Days left unfetched because the
+        circuit breaker opened count as "deferred" and are not checkpointed.
+        """
+        history = self.wallpaper.history
+        done = history.backfilled_dates()
+        listed = self.list_days(start, end)
+        days = [d for d in listed if d['date'] not in done]
+        counts = {"done": 0, "no_image": 0, "failed": 0, "deferred": 0,
+                  "skipped": len(listed) - len(days)}
+        self._stop.clear()
+        print(f"Backfilling {len(days)} days with {self.workers} workers")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self._process_day, day): day for day in days}
+                for n, future in enumerate(as_completed(futures), 1):
+                    day = futures[future]
+                    status = "deferred" if future.cancelled() else future.result()
+                    counts[status] += 1
+                    if status == "deferred":
+                        # Breaker open: drop the queued days instead of fetching them
+                        for pending in futures:
+                            pending.cancel()
+                    else:
+                        history.mark_backfill(day['date'], status)
+                    if progress:
+                        progress(n, len(days), day, status)
+        finally:
+            self.wallpaper.image_store.flush()
+        return counts
+
+    def _process_day(self, day):
+        """Fetch, parse and download one day; returns its checkpoint status"""
+        if self._stop.is_set() or not self.wallpaper.breaker.allow():
+            if not self._stop.is_set():
+                print(f"Circuit breaker is {self.wallpaper.breaker.state}; stopping the backfill")
+                self._stop.set()
+            return "deferred"
+        try:
+            self.limiter.wait()
+            response = self.session.get(day['page_url'])
+            if response.status_code != 200:
+                print(f"{day['date']}: page returned {response.status_code}")
+                return "failed"
+            fields = parse_page(response.text)
+            image_info = self.wallpaper.image_info_from_fields(
+                fields, page_url=day['page_url'], date=day['date'])
+            if not image_info:
+                if not self.wallpaper.is_apod_day_page(response.text, fields):
+                    print(f"{day['date']}: no image and not an APOD page, will retry")
+                    return "failed"
+                # Video or other non-image day; also feeds the tray's negative cache
+                self.wallpaper.history.mark_no_image(day['date'], page_url=day['page_url'])
+                return "no_image"
+
+            self.limiter.wait()
+            path = self.wallpaper.download_image(image_info['url'], image_info)
+            return "done" if path else "failed"
+        except Exception as e:
+            print(f"{day['date']}: {e}")
+            traceback.print_exc()
+            return "failed"
+
+
+def main(argv=None, wallpaper=None):
+    parser = argparse.ArgumentParser(description="Download past APOD images into the wall-y archive")
+    parser.add_argument("--start", help="first day (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last day (YYYY-MM-DD)",
+                        default=datetime.date.today().isoformat())
+    parser.add_argument("--workers", type=int, default=4, help="concurrent downloads")
+    parser.add_argument("--rate", type=float, default=2.0,
+                        help="maximum requests per second to apod.nasa.gov")
+    args = parser.parse_args(argv)
+
+    def progress(n, total, day, status):
+        print(f"[{n}/{total}] {day['date']} {status}")
+
+    backfill = Backfill(wallpaper or APODWallpaper(), workers=args.workers, rate=args.rate)
+    counts = backfill.run(args.start, args.end, progress=progress)
+    print(f"Backfill finished: {counts}")
+    return 0 if counts["failed"] == 0 and counts["deferred"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import time
+import random
+import datetime
+import threading
+import logging
+
+log = logging.getLogger("wall-y")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+# Seconds after which an unanswered half-open probe may be replaced by another
+PROBE_TIMEOUT = 120
+
+
+class CircuitBreaker:
+    """Stops upstream requests after consecutive failures and probes with backoff
+
+    Closed: requests go through; ``failures`` consecutive failures open it.
+    Open: allow() refuses until the probe time, which starts ``backoff``
+    seconds after opening and doubles (with jitter) after every failed probe,
+    up to ``max_backoff``. Half-open: one probe request is let through; its
+    success closes the breaker, its failure re-opens it.
+
+    Outcomes are reported by the HTTP adapters (http_session), gating is up
+    to the callers. Thread-safe.
+    """
+
+    def __init__(self, failures=3, backoff=60, max_backoff=3600):
+        self.failures = failures
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.delay = 0
+        self.probe_at = None
+        self.opened_at = None
+        self.last_error = None
+
+    def allow(self):
+        """Whether a request may go upstream now (claims the probe when one is due)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now >= self.probe_at:
+                self.state = HALF_OPEN
+                self.probe_at = now
+                return True
+            if self.state == HALF_OPEN and now >= self.probe_at + PROBE_TIMEOUT:
+                # The probe never reported back (no request was needed after all)
+                self.probe_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                log.info(f"Upstream reachable again; circuit closed after {self._open_for()}")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.delay = 0
+            self.probe_at = self.opened_at = None
+            self.last_error = None
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = error
+            if self.state == HALF_OPEN:
+                self._open(min(self.delay * 2, self.max_backoff))
+            elif self.state == CLOSED and self.consecutive_failures >= self.failures:
+                self.opened_at = time.time()
+                self._open(self.backoff)
+
+    def _open(self, delay):
+        self.state = OPEN
+        self.delay = delay
+        # Equal jitter, like JitteredRetry, so a fleet does not probe in step
+        wait = delay / 2 + random.uniform(0, delay / 2)
+        self.probe_at = time.monotonic() + wait
+        log.warning(f"Upstream failing ({self.last_error}); circuit open, next probe in {wait:.0f}s")
+
+    def _open_for(self):
+        if self.opened_at is None:
+            return "0s"
+        return f"{time.time() - self.opened_at:.0f}s"
+
+    def next_probe(self):
+        """Wall-clock time of the next probe (datetime), or None unless open"""
+        with self._lock:
+            if self.state != OPEN:
+                return None
+            remaining = max(0.0, self.probe_at - time.monotonic())
+        return datetime.datetime.now() + datetime.timedelta(seconds=remaining)
+
+    def describe(self):
+        """One line for the tray tooltip; empty while closed"""
+        if self.state == CLOSED:
+            return ""
+        if self.state == HALF_OPEN:
+            return "APOD site unreachable, checking again..."
+        probe = self.next_probe()
+        return f"APOD site unreachable, next try at {probe:%H:%M}" if probe else ""
+
+    def status(self):
+        probe = self.next_probe()
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "next_probe": probe.isoformat(timespec="seconds") if probe else None,
+        }
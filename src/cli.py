@@ -0,0 +1,171 @@
+"""wall-y command line: the APOD core without the tray app or a desktop session
+
+    wall-y fetch                 download today's APOD into the archive
+    wall-y backfill [--start ..] download past days (see backfill.py)
+    wall-y apply [DAY|PATH]      set today's image, an archived day or a file as wallpaper
+    wall-y status                show what is archived and applied
+    wall-y tray COMMAND          send update-now, status or apply DATE to the running tray app
+    wall-y mirror [--port N]     serve a caching APOD mirror for other desktops on the LAN
+"""
+import os
+import sys
+import json
+import argparse
+import contextlib
+
+from apod_core import APODWallpaper, load_settings
+
+
+def _size(value):
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def cmd_fetch(wallpaper, args):
+    image_info = wallpaper.get_latest_image_info()
+    if not image_info:
+        return 1, {"error": "could not fetch the APOD page"}
+    if image_info.get('no_image'):
+        return 0, {"date": image_info['date'], "title": image_info['title'], "no_image": True}
+    path = wallpaper.download_image(image_info['url'], image_info)
+    result = {"date": image_info['date'], "title": image_info['title'], "url": image_info['url'],
+              "path": path}
+    return (0 if path else 1), result
+
+
+def cmd_backfill(wallpaper, args):
+    import backfill
+    argv = ["--workers", str(args.workers), "--rate", str(args.rate)]
+    if args.start:
+        argv += ["--start", args.start]
+    if args.end:
+        argv += ["--end", args.end]
+    return backfill.main(argv, wallpaper=wallpaper), None
+
+
+def cmd_apply(wallpaper, args):
+    target = args.target
+    image_url = None
+    if target is None:
+        # Same path as the tray's update: fetch, download, apply, record
+        success, image_url = wallpaper.update_wallpaper()
+        if success and image_url:
+            wallpaper.record_last_update(image_url)
+            wallpaper.enforce_retention()
+        return (0 if success else 1), {"url": image_url}
+
+    if os.path.exists(target):
+        path = target
+    else:
+        record = wallpaper.history.get_by_date(target)
+        path = record.get('local_path') if record else None
+        image_url = record.get('url') if record else None
+        if not path or not os.path.exists(path):
+            image_info, path = wallpaper.fetch_day(target)
+            image_url = image_info['url'] if image_info else None
+        if not path:
+            return 1, {"error": f"no image for {target}"}
+
+    ok = wallpaper.set_wallpaper(path)
+    if ok and image_url:
+        wallpaper.history.mark_applied(image_url, latest=False)
+    return (0 if ok else 1), {"path": path, "backend": wallpaper.backend.name}
+
+
+def cmd_status(wallpaper, args):
+    history = wallpaper.history
+    retention = history.get_state("retention_report")
+    return 0, {
+        "archive": wallpaper.download_dir,
+        "backend": wallpaper.backend.name,
+        "latest": history.latest(),
+        "last_applied": history.latest_applied(),
+        "last_update": history.get_state("last_update"),
+        "counts": history.counts(),
+        "page_cache": wallpaper.page_cache.stats(),
+        "retention": json.loads(retention) if retention else None,
+    }
+
+
+def run_mirror(settings, args):
+    from mirror import create_mirror
+    download_dir = args.dir or os.path.join(os.path.expanduser("~"), "Pictures", "wall-y")
+    server = create_mirror(settings, os.path.join(download_dir, "cache", "mirror"),
+                           bind=args.bind, port=args.port)
+    print(f"Mirroring {server.cache.upstream_url} at {server.url} "
+          f"(pages revalidated every {server.cache.page_ttl}s)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+def _print_human(result):
+    for key, value in result.items():
+        if isinstance(value, dict):
+            value = ", ".join(f"{k}={v}" for k, v in value.items()
+                              if k not in ('description',))
+        print(f"{key}: {value}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="wall-y", description="NASA APOD wallpaper tools")
+    parser.add_argument("--settings", help="settings.env to use")
+    parser.add_argument("--dir", help="archive directory (default: ~/Pictures/wall-y)")
+    parser.add_argument("--backend", help="wallpaper backend: auto, windows, gnome or none")
+    parser.add_argument("--size", type=_size, help="screen size for the applied copy, e.g. 1920x1080")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("fetch", help="download today's APOD into the archive")
+    backfill = commands.add_parser("backfill", help="download past APOD days")
+    backfill.add_argument("--start", help="first day (YYYY-MM-DD)")
+    backfill.add_argument("--end", help="last day (YYYY-MM-DD)")
+    backfill.add_argument("--workers", type=int, default=4, help="concurrent downloads")
+    backfill.add_argument("--rate", type=float, default=2.0, help="maximum requests per second")
+    apply = commands.add_parser("apply", help="set a wallpaper")
+    apply.add_argument("target", nargs="?", help="YYYY-MM-DD or an image file (default: today's APOD)")
+    commands.add_parser("status", help="show archive and wallpaper state")
+    tray = commands.add_parser("tray", help="control the running tray app")
+    tray.add_argument("tray_command", choices=("update-now", "status", "apply"))
+    tray.add_argument("day", nargs="?", help="YYYY-MM-DD for apply")
+    mirror = commands.add_parser("mirror", help="serve a caching APOD mirror for the LAN")
+    mirror.add_argument("--bind", help="listen address (default: MIRROR_BIND)")
+    mirror.add_argument("--port", type=int, help="listen port (default: MIRROR_PORT)")
+    args = parser.parse_args(argv)
+
+    if args.command == "tray":
+        # Talks to the running app over its control channel; loads neither Qt nor the core
+        import control
+        code = control.forward([args.tray_command] + ([args.day] if args.day else []))
+        if code is None:
+            print("wall-y is not running", file=sys.stderr)
+            return 1
+        return code
+    if args.command == "mirror":
+        # A long-running server, not an archive operation; no APODWallpaper needed
+        return run_mirror(load_settings(args.settings), args)
+
+    handlers = {"fetch": cmd_fetch, "backfill": cmd_backfill, "apply": cmd_apply, "status": cmd_status}
+    # Progress messages from the core go to stderr so stdout carries only the result
+    with contextlib.redirect_stdout(sys.stderr):
+        settings = load_settings(args.settings)
+        wallpaper = APODWallpaper(settings, download_dir=args.dir, backend=args.backend)
+        wallpaper.screen_size = args.size
+        try:
+            code, result = handlers[args.command](wallpaper, args)
+        finally:
+            wallpaper.shutdown_variant_pool()
+    if result is not None:
+        if args.json:
+            print(json.dumps(result, indent=2, default=str))
+        else:
+            _print_human(result)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Control channel of the running tray app
+
+The tray app listens on a QLocalServer (a Unix domain socket, or a named
+pipe on Windows). Another launch, ``wall-y tray ...`` or a login script
+sends one command line and reads one JSON line back:
+
+    update-now      start an update, as the tray menu's "Update Wallpaper Now"
+    status          what is shown and whether an update is running
+    apply DATE      set an archived (or fetched) past day as the wallpaper
+    show            a second launch without a command: say we are running
+
+This module is the Qt-free client side plus the names both sides use, so a
+second launch can forward its command before PyQt is imported. The server
+is control_server.ControlServer.
+"""
+import os
+import sys
+import json
+import socket
+import getpass
+import tempfile
+
+COMMANDS = ("update-now", "status", "apply", "show")
+TIMEOUT = 5.0
+
+
+def server_name():
+    """Name for QLocalServer.listen(): a socket path, or a pipe name on Windows"""
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "user"
+    name = f"wall-y-{user}"
+    if sys.platform == "win32":
+        return name
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"{name}.sock")
+
+
+def lock_path():
+    """File whose OS lock marks the one tray instance of this user"""
+    if sys.platform == "win32":
+        return os.path.join(tempfile.gettempdir(), server_name() + ".lock")
+    return server_name() + ".lock"
+
+
+def acquire_instance_lock():
+    """Take the per-user single-instance lock without blocking
+
+    Returns the open lock file, to be kept for the life of the process, or
+    None if another instance holds it. The OS releases the lock when the
+    process exits, so a crashed instance never leaves it behind.
+    """
+    handle = open(lock_path(), "a+b")
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def send_command(command, timeout=TIMEOUT):
+    """Send one command line to the running tray app
+
+    Returns the decoded reply, or None if no instance is listening.
+    """
+    name = server_name()
+    request = (command.strip() + "\n").encode("utf-8")
+    if sys.platform == "win32":
+        reply = _pipe_exchange("\\\\.\\pipe\\" + name, request, timeout)
+        if reply is None:
+            return None
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(name)
+        except OSError:
+            # No socket, one left behind by an instance that crashed, or no answer in time
+            sock.close()
+            return None
+        with sock:
+            try:
+                sock.sendall(request)
+            except OSError:
+                reply = ""
+            else:
+                reply = _read_line(sock.recv)
+    return json.loads(reply) if reply else {"ok": False, "error": "no reply"}
+
+
+def _pipe_exchange(path, request, timeout):
+    """Windows: write request to the named pipe and read one line, within timeout
+
+    Returns None if the pipe could not be opened, else the reply line ("" if
+    none came in time). Pipe reads cannot time out, so the exchange runs on a
+    daemon thread that is abandoned at the deadline.
+    """
+    import ctypes
+    import threading
+    # Also waits out ERROR_PIPE_BUSY while the server is between connections
+    if not ctypes.windll.kernel32.WaitNamedPipeW(path, max(int(timeout * 1000), 1)):
+        return None
+    result = {}
+
+    def exchange():
+        try:
+            with open(path, "r+b", buffering=0) as pipe:
+                result["reply"] = ""
+                pipe.write(request)
+                result["reply"] = _read_line(pipe.read)
+        except OSError:
+            pass
+
+    worker = threading.Thread(target=exchange, name="wall-y-control", daemon=True)
+    worker.start()
+    worker.join(timeout)
+    return result.get("reply")
+
+
+def _read_line(read):
+    data = b""
+    while not data.endswith(b"\n"):
+        try:
+            chunk = read(4096)
+        except (BrokenPipeError, ConnectionResetError, socket.timeout):
+            break
+        if not chunk:
+            break
+        data += chunk
+    return data.decode("utf-8").strip()
+
+
+def forward(argv):
+    """Send argv (a command, or "show" when empty) to the running instance and print the reply
+
+    Returns the exit code for the caller, or None if no instance is running.
+    """
+    reply = send_command(" ".join(argv) or "show")
+    if reply is None:
+        return None
+    print(json.dumps(reply, indent=2, default=str))
+    return 0 if reply.get("ok") else 1
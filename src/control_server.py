@@ -0,0 +1,55 @@
+import json
+import logging
+from PyQt5 import QtNetwork
+from control import COMMANDS, server_name, send_command
+
+log = logging.getLogger("wall-y")
+
+
+class ControlServer(QtNetwork.QLocalServer):
+    """Answers control.send_command() requests inside the tray app
+
+    Each connection carries one command line; ``handler(command, args)`` runs
+    on the GUI thread and returns the dict sent back as a JSON line.
+    """
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.newConnection.connect(self._accept)
+
+    def start(self):
+        name = server_name()
+        self.setSocketOptions(QtNetwork.QLocalServer.UserAccessOption)
+        if not self.listen(name):
+            if send_command("status", timeout=1) is not None:
+                log.warning("Control channel is owned by another running instance")
+                return False
+            # Left behind by an instance that crashed
+            QtNetwork.QLocalServer.removeServer(name)
+            if not self.listen(name):
+                log.warning(f"Control channel not started: {self.errorString()}")
+                return False
+        return True
+
+    def _accept(self):
+        while self.hasPendingConnections():
+            connection = self.nextPendingConnection()
+            connection.readyRead.connect(lambda c=connection: self._read(c))
+            connection.disconnected.connect(connection.deleteLater)
+
+    def _read(self, connection):
+        if not connection.canReadLine():
+            return
+        line = bytes(connection.readLine()).decode("utf-8", "replace").strip()
+        command, _, args = line.partition(" ")
+        try:
+            if command in COMMANDS:
+                reply = self.handler(command, args.strip())
+            else:
+                reply = {"ok": False, "error": f"unknown command {command!r}", "commands": list(COMMANDS)}
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        connection.write((json.dumps(reply, default=str) + "\n").encode("utf-8"))
+        connection.flush()
+        connection.disconnectFromServer()
@@ -0,0 +1,142 @@
+import os
+import hashlib
+import itertools
+import logging
+from image_probe import ImageRejected, PROBE_LIMIT
+
+log = logging.getLogger("wall-y")
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+MAX_RESUMES = 3
+PROBE_CHUNK_SIZE = 8 * 1024
+
+
+def pick_chunk_size(content_length):
+    """Scale the read size with the file: ~64 reads per file, 64 KB to 1 MB"""
+    if not content_length:
+        return MIN_CHUNK_SIZE * 4
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, content_length // 64))
+
+
+def _expected_size(response, offset):
+    """Total size the finished file should have, or None if the server did not say"""
+    if response.status_code == 206:
+        content_range = response.headers.get("Content-Range", "")
+        total = content_range.rsplit("/", 1)[-1]
+        if total.isdigit():
+            return int(total)
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length) + (offset if response.status_code == 206 else 0)
+    return None
+
+
+def _read_head(part_path):
+    with open(part_path, 'rb') as f:
+        return f.read(PROBE_LIMIT)
+
+
+def download_file(url, dest_path, timeout=None, max_resumes=MAX_RESUMES, session=None, check=None):
+    """Stream a URL to dest_path atomically, resuming after dropped connections
+
+    Data goes to ``dest_path + ".part"`` and is renamed into place only once
+    the byte count matches Content-Length, so a truncated transfer never looks
+    like a finished image. A leftover .part file (from this run or an earlier
+    one) is resumed with an HTTP Range request. The SHA-256 is computed while
+    streaming.
+
+    Pass a ``requests.Session`` to reuse pooled connections across downloads;
+    without an explicit timeout the session's default applies.
+
+    ``check`` (an image_probe.SizeCheck) sees the Content-Type and the first
+    bytes as they arrive; when it raises ImageRejected the connection is
+    dropped, the partial file deleted and the exception passed on.
+
+    Returns a dict with ``path``, ``size`` and ``sha256``, or None on failure.
+    """
+    # Imported here rather than at module level to keep it off the startup path
+    import requests
+    from http_session import retry_count
+    from telemetry import add
+    http = session or requests
+    if session is None and timeout is None:
+        timeout = 30
+    part_path = dest_path + ".part"
+    sha = hashlib.sha256()
+    offset = 0
+    if os.path.exists(part_path):
+        # Re-hash what we already have so the digest covers the whole file
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(MAX_CHUNK_SIZE), b''):
+                sha.update(block)
+                offset += len(block)
+
+    attempts = 0
+    transferred = 0
+    while True:
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            response = http.get(url, stream=True, timeout=timeout, headers=headers)
+            add(retries=retry_count(response))
+            with response:
+                if response.status_code == 416 and offset:
+                    # Our partial file does not fit the current resource; start over
+                    os.remove(part_path)
+                    sha, offset = hashlib.sha256(), 0
+                    continue
+                if response.status_code not in (200, 206):
+                    log.warning(f"Failed to download image: {response.status_code}")
+                    return None
+                if response.status_code == 200 and offset:
+                    # Server ignored the Range header and is sending everything again
+                    sha, offset = hashlib.sha256(), 0
+
+                expected = _expected_size(response, offset)
+                chunk_size = pick_chunk_size(expected)
+                chunks = response.iter_content(chunk_size)
+                if check is not None:
+                    check.start(response.headers.get("Content-Type"), _read_head(part_path) if offset else b'')
+                    if not check.done:
+                        # A small first read, so a bad header costs a few KB rather than a full chunk
+                        first = response.raw.read(PROBE_CHUNK_SIZE, decode_content=True)
+                        chunks = itertools.chain([first] if first else [], chunks)
+                mode = 'ab' if offset else 'wb'
+                with open(part_path, mode, buffering=MAX_CHUNK_SIZE) as f:
+                    for chunk in chunks:
+                        transferred += len(chunk)
+                        if check is not None and not check.done:
+                            check.feed(chunk)
+                        sha.update(chunk)
+                        f.write(chunk)
+                        offset += len(chunk)
+        except ImageRejected as e:
+            log.warning(f"Download stopped after {transferred} bytes: {e}")
+            add(bytes=transferred, rejected=1)
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout) as e:
+            attempts += 1
+            if attempts > max_resumes:
+                log.warning(f"Download failed after {max_resumes} resumes: {e}")
+                add(bytes=transferred)
+                return None
+            log.warning(f"Download interrupted at {offset} bytes, resuming: {e}")
+            add(resumes=1)
+            continue
+
+        if expected is not None and offset != expected:
+            attempts += 1
+            if offset > expected or attempts > max_resumes:
+                log.warning(f"Download size mismatch: got {offset} bytes, expected {expected}")
+                os.remove(part_path)
+                return None
+            log.warning(f"Download short by {expected - offset} bytes, resuming")
+            continue
+
+        add(bytes=transferred)
+        os.replace(part_path, dest_path)
+        return {"path": dest_path, "size": offset, "sha256": sha.hexdigest()}
@@ -0,0 +1,157 @@
+import os
+import logging
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from thumbnails import THUMB_SIZE, make_thumbnail
+from workers import Task
+
+log = logging.getLogger("wall-y")
+
+# Decoded thumbnails kept in memory (KB); everything else stays on disk
+PIXMAP_CACHE_KB = 32 * 1024
+
+
+class GalleryModel(QtCore.QAbstractListModel):
+    """Archived APOD days as a list model with lazily generated thumbnails
+
+    Only the (small) history rows are loaded up front. A thumbnail is
+    requested the first time the view asks for a row's icon, i.e. when the
+    row scrolls into view, and generated on a worker thread.
+    """
+
+    # image path, thumbnail path (None on failure); emitted from pool threads
+    thumbnail_ready = QtCore.pyqtSignal(str, object)
+
+    def __init__(self, history, thumbs_dir, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.thumbs_dir = thumbs_dir
+        self.rows = []
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, min(4, QtCore.QThread.idealThreadCount())))
+        self._pending = set()
+        self._thumb_paths = {}
+        self._row_numbers = {}
+        self._placeholder = QtGui.QPixmap(THUMB_SIZE, THUMB_SIZE * 2 // 3)
+        self._placeholder.fill(QtGui.QColor("#dddddd"))
+        QtGui.QPixmapCache.setCacheLimit(max(QtGui.QPixmapCache.cacheLimit(), PIXMAP_CACHE_KB))
+        self.thumbnail_ready.connect(self._on_thumbnail_ready)
+
+    def reload(self):
+        self.beginResetModel()
+        self.rows = self.history.gallery_rows()
+        self._row_numbers = {}
+        for number, row in enumerate(self.rows):
+            self._row_numbers.setdefault(row['local_path'], []).append(number)
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return row['date']
+        if role == QtCore.Qt.ToolTipRole:
+            return f"{row['date']}\n{row.get('title') or ''}"
+        if role == QtCore.Qt.DecorationRole:
+            return self._pixmap(row)
+        if role == QtCore.Qt.UserRole:
+            return row
+        return None
+
+    def shutdown(self):
+        # Queued jobs are dropped; forget them so the next showing requests them again
+        self.pool.clear()
+        self._pending.clear()
+
+    def _pixmap(self, row):
+        thumb = self._thumb_paths.get(row['local_path'])
+        if thumb:
+            pixmap = QtGui.QPixmapCache.find(thumb)
+            if pixmap is None or pixmap.isNull():
+                pixmap = QtGui.QPixmap(thumb)
+                QtGui.QPixmapCache.insert(thumb, pixmap)
+            return pixmap
+        if row['local_path'] not in self._pending:
+            self._pending.add(row['local_path'])
+            self.pool.start(Task(self._generate, row['local_path']))
+        return self._placeholder
+
+    def _generate(self, local_path):
+        try:
+            path = make_thumbnail(local_path, self.thumbs_dir)
+        except Exception as e:
+            log.error(f"Error creating thumbnail for {local_path}: {e}")
+            path = None
+        self.thumbnail_ready.emit(local_path, path)
+
+    def _on_thumbnail_ready(self, local_path, path):
+        self._pending.discard(local_path)
+        if not path:
+            return
+        self._thumb_paths[local_path] = path
+        for number in self._row_numbers.get(local_path, ()):
+            index = self.index(number)
+            self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+
+class GalleryWindow(QtWidgets.QWidget):
+    """Grid of past APOD days; double-click (or Apply) sets one as the wallpaper"""
+
+    # The history row of the day to apply
+    apply_requested = QtCore.pyqtSignal(object)
+
+    def __init__(self, history, thumbs_dir, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("APOD Gallery")
+        self.resize(900, 600)
+
+        self.model = GalleryModel(history, thumbs_dir, self)
+        self.view = QtWidgets.QListView()
+        self.view.setViewMode(QtWidgets.QListView.IconMode)
+        self.view.setIconSize(QtCore.QSize(THUMB_SIZE, THUMB_SIZE))
+        self.view.setGridSize(QtCore.QSize(THUMB_SIZE + 24, THUMB_SIZE + 36))
+        self.view.setResizeMode(QtWidgets.QListView.Adjust)
+        self.view.setMovement(QtWidgets.QListView.Static)
+        # Same-sized items let the view lay out thousands of rows without measuring each one
+        self.view.setUniformItemSizes(True)
+        self.view.setLayoutMode(QtWidgets.QListView.Batched)
+        self.view.setModel(self.model)
+        self.view.doubleClicked.connect(self._apply_index)
+        self.view.selectionModel().currentChanged.connect(self._show_details)
+
+        self.details = QtWidgets.QLabel()
+        self.details.setWordWrap(True)
+        apply_button = QtWidgets.QPushButton("Apply")
+        apply_button.clicked.connect(lambda: self._apply_index(self.view.currentIndex()))
+
+        bottom = QtWidgets.QHBoxLayout()
+        bottom.addWidget(self.details, 1)
+        bottom.addWidget(apply_button)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.view)
+        layout.addLayout(bottom)
+
+    def showEvent(self, event):
+        # Re-read the history each time so new and evicted days show up
+        self.model.reload()
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.model.shutdown()
+        super().closeEvent(event)
+
+    def _show_details(self, index):
+        row = index.data(QtCore.Qt.UserRole) if index.isValid() else None
+        self.details.setText(f"{row['date']} - {row.get('title') or ''}" if row else "")
+
+    def _apply_index(self, index):
+        try:
+            row = index.data(QtCore.Qt.UserRole) if index.isValid() else None
+            if row and os.path.exists(row['local_path']):
+                self.apply_requested.emit(row)
+        except Exception as e:
+            log.exception(f"Error applying gallery image: {e}")
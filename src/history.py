@@ -0,0 +1,318 @@
+import os
+import re
+import sqlite3
+import datetime
+import threading
+import logging
+
+log = logging.getLogger("wall-y")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    date TEXT PRIMARY KEY,
+    url TEXT,
+    page_url TEXT,
+    title TEXT,
+    description TEXT,
+    local_path TEXT,
+    sha256 TEXT,
+    width INTEGER,
+    height INTEGER,
+    fetched_at TEXT,
+    applied_at TEXT,
+    favorite INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS images_url ON images(url);
+CREATE INDEX IF NOT EXISTS images_local_path ON images(local_path);
+CREATE INDEX IF NOT EXISTS images_applied_at ON images(applied_at);
+CREATE TABLE IF NOT EXISTS backfill (
+    date TEXT PRIMARY KEY,
+    status TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS no_image_days (
+    date TEXT PRIMARY KEY,
+    page_url TEXT,
+    title TEXT,
+    description TEXT,
+    checked_at TEXT
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+class History:
+    """SQLite index of downloaded APOD days plus small pieces of app state"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # One shared connection; the lock serialises access from worker threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        """Add columns introduced after a database was created"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(images)")}
+        if "favorite" not in columns:
+            self._conn.execute("ALTER TABLE images ADD COLUMN favorite INTEGER NOT NULL DEFAULT 0")
+
+    def _row_to_dict(self, row):
+        return dict(row) if row is not None else None
+
+    def record_image(self, image_info, local_path=None, sha256=None, width=None, height=None):
+        """Insert or update the row for an APOD day; unknown fields keep their stored values"""
+        date = image_info.get('date') or datetime.datetime.now().strftime("%Y-%m-%d")
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO images (date, url, page_url, title, description, local_path,
+                                       sha256, width, height, fetched_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(date) DO UPDATE SET
+                       url = COALESCE(excluded.url, url),
+                       page_url = COALESCE(excluded.page_url, page_url),
+                       title = COALESCE(excluded.title, title),
+                       description = COALESCE(excluded.description, description),
+                       local_path = COALESCE(excluded.local_path, local_path),
+                       sha256 = COALESCE(excluded.sha256, sha256),
+                       width = COALESCE(excluded.width, width),
+                       height = COALESCE(excluded.height, height),
+                       fetched_at = excluded.fetched_at""",
+                (date, image_info.get('url'), image_info.get('page_url'), image_info.get('title'),
+                 image_info.get('description'), local_path, sha256, width, height, _now()))
+
+    def mark_applied(self, image_url, latest=True):
+        """Record that an image became the wallpaper, in one transaction
+
+        ``latest=False`` is for re-applying a past day: it is timestamped for
+        LRU purposes without becoming the "last downloaded APOD" state.
+        """
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE images SET applied_at = ? WHERE url = ?", (now, image_url))
+            if latest:
+                self._set_state("last_image_url", image_url)
+                self._set_state("last_update", now[:10])
+
+    def get_by_date(self, date):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM images WHERE date = ?", (date,)).fetchone()
+        return self._row_to_dict(row)
+
+    def get_by_url(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM images WHERE url = ? ORDER BY date DESC LIMIT 1", (url,)).fetchone()
+        return self._row_to_dict(row)
+
+    def get_by_path(self, local_path):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM images WHERE local_path = ? ORDER BY date DESC LIMIT 1",
+                (local_path,)).fetchone()
+        return self._row_to_dict(row)
+
+    def latest(self):
+        """Most recent APOD day we know about"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM images ORDER BY date DESC LIMIT 1").fetchone()
+        return self._row_to_dict(row)
+
+    def latest_applied(self):
+        """The image that was most recently set as the wallpaper"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM images WHERE applied_at IS NOT NULL "
+                "ORDER BY applied_at DESC LIMIT 1").fetchone()
+        return self._row_to_dict(row)
+
+    def set_favorite(self, date, favorite=True):
+        """Mark a day as a favorite; the "favorites" retention policy never evicts it"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE images SET favorite = ? WHERE date = ?", (int(bool(favorite)), date))
+
+    def stored_images(self):
+        """Rows that still have a local file, least recently used first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM images WHERE local_path IS NOT NULL "
+                "ORDER BY COALESCE(applied_at, fetched_at) ASC").fetchall()
+        return [dict(row) for row in rows]
+
+    def gallery_rows(self):
+        """Days with a local image, newest first (just the columns the gallery shows)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, url, title, description, local_path, favorite FROM images "
+                "WHERE local_path IS NOT NULL ORDER BY date DESC").fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self):
+        """Number of known days, days with a local file, and favorites"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS days, COUNT(local_path) AS stored, "
+                "COALESCE(SUM(favorite), 0) AS favorites FROM images").fetchone()
+        return dict(row)
+
+    def forget_local_path(self, local_path):
+        """The file was evicted: keep the days' text, drop the link to the file"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE images SET local_path = NULL WHERE local_path = ?", (local_path,))
+
+    def get_state(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row is not None else default
+
+    def set_state(self, key, value):
+        with self._lock, self._conn:
+            self._set_state(key, value)
+
+    def _set_state(self, key, value):
+        self._conn.execute(
+            "INSERT INTO state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def mark_backfill(self, date, status):
+        """Checkpoint one archive day: 'done', 'no_image' or 'failed'"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO backfill (date, status, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(date) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at",
+                (date, status, _now()))
+
+    def mark_no_image(self, date, page_url=None, title=None, description=None):
+        """Remember that an APOD day has no image (video or other embedded media)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO no_image_days (date, page_url, title, description, checked_at)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(date) DO UPDATE SET
+                       page_url = COALESCE(excluded.page_url, page_url),
+                       title = COALESCE(excluded.title, title),
+                       description = COALESCE(excluded.description, description),
+                       checked_at = excluded.checked_at""",
+                (date, page_url, title, description, _now()))
+
+    def get_no_image(self, date):
+        """The no-image record for a day, or None if it has an image or was never checked"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM no_image_days WHERE date = ?", (date,)).fetchone()
+        return self._row_to_dict(row)
+
+    def fallback_image(self, policy="latest"):
+        """An archived image to show instead of a non-image day
+
+        ``latest`` is the most recent day with a stored image, ``random`` any
+        stored day. Rows whose file has gone missing are skipped.
+        """
+        order = "RANDOM()" if policy == "random" else "date DESC"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM images WHERE local_path IS NOT NULL ORDER BY {order} LIMIT 20").fetchall()
+        for row in rows:
+            if os.path.exists(row["local_path"]):
+                return dict(row)
+        return None
+
+    def backfilled_dates(self):
+        """Dates a previous backfill finished (downloaded or confirmed to have no image)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date FROM backfill WHERE status IN ('done', 'no_image')").fetchall()
+        return {row["date"] for row in rows}
+
+    def import_legacy(self, download_dir, read_metadata=None):
+        """One-time import of apod_*.txt sidecars, last_image.txt/last_update.txt and image files
+
+        ``read_metadata(path)`` (optional) returns the metadata embedded in an
+        image so existing files can be linked to their APOD day.
+        """
+        if self.get_state("legacy_imported"):
+            return 0
+        imported = 0
+        try:
+            names = os.listdir(download_dir)
+        except OSError:
+            names = []
+
+        rows = []
+        for name in names:
+            match = re.match(r'apod_(\d{4}-\d{2}-\d{2})\.txt$', name)
+            if not match:
+                continue
+            try:
+                with open(os.path.join(download_dir, name), 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except OSError as e:
+                log.warning(f"Skipping {name}: {e}")
+                continue
+            title = re.search(r'Title: (.*?)\n', content)
+            desc = re.search(r'Description: (.*?)(?:\n\n|$)', content, re.DOTALL)
+            page_url = re.search(r'URL: (.*)$', content)
+            rows.append({
+                'date': match.group(1),
+                'title': title.group(1) if title else None,
+                'description': desc.group(1) if desc else None,
+                'page_url': page_url.group(1).strip() if page_url else None,
+            })
+
+        images = []
+        if read_metadata:
+            for name in names:
+                if not name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                    continue
+                path = os.path.join(download_dir, name)
+                metadata = read_metadata(path) or {}
+                date = str(metadata.get('date') or '')
+                if re.match(r'\d{4}-\d{2}-\d{2}$', date):
+                    images.append((date, path, metadata))
+
+        last_image_url = self._read_text(os.path.join(download_dir, "last_image.txt"))
+        last_update = self._read_text(os.path.join(download_dir, "last_update.txt"))
+
+        now = _now()
+        with self._lock, self._conn:
+            for row in rows:
+                self._conn.execute(
+                    """INSERT OR IGNORE INTO images (date, page_url, title, description, fetched_at)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (row['date'], row['page_url'], row['title'], row['description'], now))
+                imported += 1
+            for date, path, metadata in images:
+                self._conn.execute(
+                    """INSERT INTO images (date, title, description, local_path, fetched_at)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT(date) DO UPDATE SET local_path = excluded.local_path,
+                           title = COALESCE(title, excluded.title),
+                           description = COALESCE(description, excluded.description)""",
+                    (date, metadata.get('title'), metadata.get('description'), path, now))
+            if last_image_url:
+                self._set_state("last_image_url", last_image_url)
+                self._conn.execute(
+                    "UPDATE images SET url = ? WHERE local_path LIKE ? AND url IS NULL",
+                    (last_image_url, "%" + os.sep + last_image_url.split('/')[-1]))
+            if last_update:
+                self._set_state("last_update", last_update)
+            self._set_state("legacy_imported", now)
+        return imported
+
+    @staticmethod
+    def _read_text(path):
+        try:
+            with open(path, 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
@@ -0,0 +1,132 @@
+import random
+import requests
+import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from telemetry import annotate
+
+log = logging.getLogger("wall-y")
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry whose exponential backoff is randomised ("equal jitter")
+
+    Spreads retries from many machines hitting the same outage instead of
+    having them all come back on the same beat.
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return 0
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout when a call does not pass one
+
+    With a ``breaker`` (circuit_breaker.CircuitBreaker) every request's final
+    outcome, after urllib3's retries, is reported to it: connection errors,
+    timeouts and RETRY_STATUSES answers count as failures.
+    """
+
+    def __init__(self, *args, timeout=None, breaker=None, **kwargs):
+        self.timeout = timeout
+        self.breaker = breaker
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if self.breaker is None:
+            return super().send(request, **kwargs)
+        try:
+            response = super().send(request, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self.breaker.record_failure(type(e).__name__)
+            raise
+        if response.status_code in RETRY_STATUSES:
+            self.breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            self.breaker.record_success()
+        return response
+
+
+class FallbackAdapter(TimeoutHTTPAdapter):
+    """Sends requests for a mirror prefix to the mirror, and to upstream when it fails
+
+    The mirror gets one attempt: a connection error, timeout or 5xx answer
+    re-sends the same request with the mirror prefix swapped for the upstream
+    one, through the regular retrying adapter.
+    """
+
+    def __init__(self, mirror_url, upstream_url, upstream_adapter, **kwargs):
+        self.mirror_url = mirror_url
+        self.upstream_url = upstream_url
+        self.upstream_adapter = upstream_adapter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        try:
+            response = super().send(request, **kwargs)
+            if response.status_code < 500:
+                if self.upstream_adapter.breaker is not None:
+                    # Served by the mirror: upstream is as good as reachable
+                    self.upstream_adapter.breaker.record_success()
+                return response
+            response.close()
+            reason = f"HTTP {response.status_code}"
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            reason = type(e).__name__
+        upstream = request.copy()
+        upstream.url = self.upstream_url + request.url[len(self.mirror_url):]
+        log.warning(f"Mirror unavailable ({reason}), fetching {upstream.url}")
+        annotate(mirror_fallback=True)
+        return self.upstream_adapter.send(upstream, **kwargs)
+
+
+def retry_count(response):
+    """How many retries urllib3 needed before this response"""
+    retries = getattr(response.raw, "retries", None)
+    return len(retries.history) if retries is not None else 0
+
+
+def create_session(settings, pool_size=None, breaker=None):
+    """Build the shared keep-alive session from settings.env values
+
+    ``breaker`` receives the outcome of every request (see TimeoutHTTPAdapter).
+    """
+    retry = JitteredRetry(
+        total=settings["HTTP_RETRIES"],
+        connect=settings["HTTP_RETRIES"],
+        read=settings["HTTP_RETRIES"],
+        status=settings["HTTP_RETRIES"],
+        backoff_factor=settings["HTTP_BACKOFF"],
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=(settings["HTTP_CONNECT_TIMEOUT"], settings["HTTP_READ_TIMEOUT"]),
+        max_retries=retry,
+        pool_connections=4,
+        pool_maxsize=pool_size or settings["HTTP_POOL_SIZE"],
+        breaker=breaker,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    fallback_url = settings.get("APOD_FALLBACK_URL")
+    if fallback_url and fallback_url != settings["APOD_BASE_URL"]:
+        # APOD_BASE_URL is a LAN mirror; everything under it falls back to the real site
+        session.mount(settings["APOD_BASE_URL"], FallbackAdapter(
+            settings["APOD_BASE_URL"], fallback_url, adapter,
+            timeout=(settings["HTTP_CONNECT_TIMEOUT"], settings["HTTP_READ_TIMEOUT"]),
+            max_retries=0,
+            pool_maxsize=pool_size or settings["HTTP_POOL_SIZE"],
+        ))
+    session.headers["User-Agent"] = settings["HTTP_USER_AGENT"]
+    return session
@@ -0,0 +1,128 @@
+import os
+import shutil
+import struct
+import zlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+EXIF_HEADER = b'Exif\x00\x00'
+
+# Tags used for APOD metadata (read back by APODWallpaper.read_metadata_from_image)
+TAG_USER_COMMENT = 0x9286
+TAG_IMAGE_DESCRIPTION = 0x010e
+TAG_DATE_TIME_ORIGINAL = 0x9003
+
+
+def _copy_rest(src, dst):
+    shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def _replace_atomically(path, write):
+    """Run write(src, dst) into a temp file next to path, then swap it in"""
+    tmp_path = path + ".meta.tmp"
+    try:
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            write(src, dst)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_exif(path, image_info):
+    """Build an APP1 Exif payload: the file's existing tags plus the APOD fields"""
+    from PIL import Image
+    # Image.open only parses headers; getexif() never touches pixel data
+    with Image.open(path) as img:
+        exif = img.getexif()
+    exif[TAG_USER_COMMENT] = image_info.get('description', '') or ''
+    exif[TAG_IMAGE_DESCRIPTION] = image_info.get('title', '') or ''
+    exif[TAG_DATE_TIME_ORIGINAL] = image_info.get('date', '') or ''
+    payload = exif.tobytes()
+    if not payload.startswith(EXIF_HEADER):
+        payload = EXIF_HEADER + payload
+    return payload
+
+
+def embed_jpeg_exif(path, exif_payload):
+    """Replace (or add) the APP1/Exif segment of a JPEG; entropy data is copied untouched"""
+    if len(exif_payload) + 2 > 0xFFFF:
+        raise ValueError(f"EXIF payload too large for one APP1 segment: {len(exif_payload)} bytes")
+    app1 = b'\xff\xe1' + struct.pack('>H', len(exif_payload) + 2) + exif_payload
+
+    def write(src, dst):
+        if src.read(2) != b'\xff\xd8':
+            raise ValueError("Not a JPEG file")
+        dst.write(b'\xff\xd8')
+        inserted = False
+        while True:
+            marker = src.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                raise ValueError("Corrupt JPEG marker stream")
+            code = marker[1]
+            while code == 0xFF:
+                # Fill bytes may pad the marker
+                code = src.read(1)[0]
+                marker = b'\xff' + bytes([code])
+            if code == 0xDA or code == 0xD9:
+                # Start of scan (or EOI): headers are over, copy everything else as-is
+                if not inserted:
+                    dst.write(app1)
+                dst.write(marker)
+                _copy_rest(src, dst)
+                return
+            length_bytes = src.read(2)
+            length = struct.unpack('>H', length_bytes)[0]
+            body = src.read(length - 2)
+            if code == 0xE1 and body.startswith(EXIF_HEADER):
+                # Drop the old Exif segment; the new one replaces it
+                continue
+            if not inserted and code != 0xE0:
+                # Exif goes right after SOI / the JFIF APP0 segment
+                dst.write(app1)
+                inserted = True
+            dst.write(marker + length_bytes + body)
+
+    _replace_atomically(path, write)
+
+
+def _png_chunk(chunk_type, data):
+    crc = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+
+def _png_text_chunk(key, value):
+    """tEXt for Latin-1 text, iTXt (UTF-8) otherwise"""
+    try:
+        return _png_chunk(b'tEXt', key.encode('latin-1') + b'\x00' + value.encode('latin-1'))
+    except UnicodeEncodeError:
+        data = key.encode('latin-1') + b'\x00\x00\x00\x00\x00' + value.encode('utf-8')
+        return _png_chunk(b'iTXt', data)
+
+
+def embed_png_text(path, fields):
+    """Insert text chunks after IHDR, replacing chunks with the same keywords"""
+    keys = {k.encode('latin-1') for k in fields}
+    new_chunks = b''.join(_png_text_chunk(k, v or '') for k, v in fields.items())
+
+    def write(src, dst):
+        if src.read(8) != PNG_SIGNATURE:
+            raise ValueError("Not a PNG file")
+        dst.write(PNG_SIGNATURE)
+        while True:
+            header = src.read(8)
+            if len(header) < 8:
+                raise ValueError("Corrupt PNG chunk stream")
+            length, chunk_type = struct.unpack('>I4s', header)
+            if chunk_type == b'IDAT':
+                # Text chunks are all before the image data; copy the rest verbatim
+                dst.write(header)
+                _copy_rest(src, dst)
+                return
+            data_crc = src.read(length + 4)
+            if chunk_type in (b'tEXt', b'iTXt', b'zTXt') and data_crc[:length].split(b'\x00', 1)[0] in keys:
+                continue
+            dst.write(header + data_crc)
+            if chunk_type == b'IHDR':
+                dst.write(new_chunks)
+
+    _replace_atomically(path, write)
@@ -0,0 +1,126 @@
+import struct
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+SIGNATURES = (PNG_SIGNATURE, b'GIF87a', b'GIF89a', b'\xff\xd8')
+# Enough for JPEGs whose SOF sits behind large EXIF / ICC / Photoshop segments
+PROBE_LIMIT = 256 * 1024
+# Content types servers use for images they do not label precisely
+GENERIC_TYPES = ("application/octet-stream", "binary/octet-stream")
+# JPEG start-of-frame markers (C4 = DHT, C8 = JPG extension, CC = DAC are not frames)
+SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class ImageRejected(Exception):
+    """A download was stopped because it is not an acceptable image"""
+
+
+def check_content_type(content_type):
+    """Raise ImageRejected unless a Content-Type header can be an image (missing is allowed)"""
+    if not content_type:
+        return
+    media_type = content_type.split(";")[0].strip().lower()
+    if not media_type.startswith("image/") and media_type not in GENERIC_TYPES:
+        raise ImageRejected(f"not an image (Content-Type {media_type})")
+
+
+def probe_image(head):
+    """(format, width, height) from the first bytes of a JPEG, PNG or GIF
+
+    Returns None while more bytes are needed. Raises ImageRejected when the
+    bytes are not one of those formats or the header is damaged.
+    """
+    for signature in SIGNATURES:
+        if len(head) < len(signature) and signature.startswith(head):
+            return None
+    if head.startswith(PNG_SIGNATURE):
+        if len(head) < 24:
+            return None
+        if head[12:16] != b'IHDR':
+            raise ImageRejected("PNG without an IHDR chunk")
+        width, height = struct.unpack(">II", head[16:24])
+        return "png", width, height
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        if len(head) < 10:
+            return None
+        width, height = struct.unpack("<HH", head[6:10])
+        return "gif", width, height
+    if head.startswith(b'\xff\xd8'):
+        return _probe_jpeg(head)
+    raise ImageRejected("not a JPEG, PNG or GIF image")
+
+
+def _probe_jpeg(head):
+    # Walk the marker segments after SOI until a start-of-frame segment
+    pos = 2
+    while True:
+        if pos + 4 > len(head):
+            return None
+        if head[pos] != 0xFF:
+            raise ImageRejected("damaged JPEG header")
+        marker = head[pos + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            # Markers without a length field
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            raise ImageRejected("JPEG without a frame header")
+        length = struct.unpack(">H", head[pos + 2:pos + 4])[0]
+        if marker in SOF_MARKERS:
+            if pos + 9 > len(head):
+                return None
+            height, width = struct.unpack(">HH", head[pos + 5:pos + 9])
+            return "jpeg", width, height
+        pos += 2 + length
+
+
+class SizeCheck:
+    """Validates a download from its first bytes: Content-Type, format and minimum size
+
+    ``feed(chunk)`` raises ImageRejected as soon as the header shows the file
+    is unusable, so the caller can drop the connection after a few KB.
+    """
+
+    def __init__(self, min_width, min_height):
+        self.min_width = min_width
+        self.min_height = min_height
+        self.head = b''
+        self.result = None
+        self.done = False
+
+    def start(self, content_type, head=b''):
+        """Begin a transfer; ``head`` is what an earlier (resumed) attempt already wrote"""
+        check_content_type(content_type)
+        if not self.done:
+            self.head = b''
+            self.feed(head)
+
+    def feed(self, chunk):
+        if self.done:
+            return
+        self.head += chunk[:PROBE_LIMIT - len(self.head)]
+        if not self.head:
+            return
+        self.result = probe_image(self.head)
+        if self.result is None:
+            if len(self.head) >= PROBE_LIMIT:
+                # Header not found where expected; leave the verdict to a full decode
+                self.done = True
+            return
+        self.done = True
+        image_format, width, height = self.result
+        if width < self.min_width or height < self.min_height:
+            raise ImageRejected(f"image too small: {width}x{height} {image_format}")
+
+
+def probe_file(path):
+    """(format, width, height) from an image file's header, or None if not found"""
+    with open(path, 'rb') as f:
+        head = f.read(PROBE_LIMIT)
+    try:
+        return probe_image(head)
+    except ImageRejected:
+        return None
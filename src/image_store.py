@@ -0,0 +1,192 @@
+import os
+import json
+import hashlib
+import time
+import threading
+import logging
+from downloader import download_file
+from image_probe import probe_file
+
+log = logging.getLogger("wall-y")
+
+
+class ImageStore:
+    """Content-addressed store for downloaded images
+
+    Every image is downloaded once and indexed both by its source URL and by
+    the SHA-256 of the stored bytes (computed while streaming, and again by
+    rehash() after metadata is embedded). Files keep their original names in
+    the store directory so the folder stays browsable; two URLs that serve
+    identical bytes share one file.
+    """
+
+    def __init__(self, store_dir, index_path, session=None):
+        self.store_dir = store_dir
+        self.index_path = index_path
+        # Optional requests.Session (or a callable returning one, for lazy creation)
+        # so downloads share pooled connections
+        self.session = session
+        # Seconds between index writes; 0 writes on every add. Batch jobs raise this
+        # and call flush() at the end - a lost index entry is re-adopted from disk anyway.
+        self.save_interval = 0
+        self._last_save = 0.0
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self._index = {"urls": {}, "objects": {}}
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._index["urls"].update(data.get("urls", {}))
+                self._index["objects"].update(data.get("objects", {}))
+        except Exception as e:
+            log.error(f"Error loading image store index, starting empty: {e}")
+
+    def _save(self):
+        self._last_save = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            log.error(f"Error saving image store index: {e}")
+
+    def _url_lock(self, url):
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def lookup(self, url):
+        """Return the stored file for a URL, or None if it has not been downloaded"""
+        with self._lock:
+            digest = self._index["urls"].get(url)
+            obj = self._index["objects"].get(digest) if digest else None
+        if obj and os.path.exists(obj["path"]):
+            return obj["path"]
+        return None
+
+    def lookup_hash(self, digest):
+        """Return the stored file for a SHA-256 digest, or None"""
+        with self._lock:
+            obj = self._index["objects"].get(digest)
+        if obj and os.path.exists(obj["path"]):
+            return obj["path"]
+        return None
+
+    def hash_for(self, url):
+        """Return the SHA-256 digest recorded for a URL"""
+        with self._lock:
+            return self._index["urls"].get(url)
+
+    def fetch(self, url, check=None):
+        """Return the local file for a URL, downloading it only if it is not stored yet
+
+        ``check`` is passed to download_file (see image_probe.SizeCheck); its
+        ImageRejected propagates to the caller.
+        """
+        with self._url_lock(url):
+            path = self.lookup(url)
+            if path:
+                return path
+
+            target = self._target_path(url)
+            if os.path.exists(target):
+                if self.hash_for(url) is None and self._adoptable(target, check):
+                    # Adopt a file saved before the store existed instead of downloading it again
+                    digest = self._hash_file(target)
+                    return self._add(url, digest, target)
+                # Not ours to index (partial, foreign or a clash): leave it and use a name of our own
+                target = self._target_path(url, unique=True)
+
+            session = self.session() if callable(self.session) else self.session
+            result = download_file(url, target, session=session, check=check)
+            if not result:
+                return None
+            log.info(f"Downloaded image to: {target}")
+            return self._add(url, result["sha256"], target)
+
+    @staticmethod
+    def _adoptable(path, check):
+        """Whether an existing file is a complete-looking image that passes check's minimum size"""
+        if os.path.getsize(path) == 0:
+            return False
+        probed = probe_file(path)
+        if probed is None:
+            return False
+        _, width, height = probed
+        if check is not None and (width < check.min_width or height < check.min_height):
+            return False
+        return True
+
+    def _target_path(self, url, unique=False):
+        """Pick a file name for a URL, avoiding clashes with other stored images"""
+        filename = url.split('/')[-1]
+        target = os.path.join(self.store_dir, filename)
+        with self._lock:
+            taken = {obj["path"] for obj in self._index["objects"].values()}
+        if unique or target in taken:
+            name, ext = os.path.splitext(filename)
+            digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:8]
+            target = os.path.join(self.store_dir, f"{name}_{digest}{ext}")
+        return target
+
+    def _add(self, url, digest, path):
+        """Index a downloaded file; identical content collapses onto the existing copy"""
+        with self._lock:
+            existing = self._index["objects"].get(digest)
+            if existing and existing["path"] != path and os.path.exists(existing["path"]):
+                os.remove(path)
+                path = existing["path"]
+            else:
+                self._index["objects"][digest] = {"path": path, "size": os.path.getsize(path)}
+            self._index["urls"][url] = digest
+            if time.monotonic() - self._last_save >= self.save_interval:
+                self._save()
+        return path
+
+    def rehash(self, path):
+        """Re-index a stored file whose bytes were rewritten in place; returns the new digest
+
+        Metadata embedding changes the file, so its entries move from the
+        upstream digest to the digest of what is on disk.
+        """
+        digest = self._hash_file(path)
+        with self._lock:
+            stale = {d for d, obj in self._index["objects"].items() if obj["path"] == path}
+            for old in stale:
+                del self._index["objects"][old]
+            self._index["objects"][digest] = {"path": path, "size": os.path.getsize(path)}
+            for url, old in self._index["urls"].items():
+                if old in stale:
+                    self._index["urls"][url] = digest
+            if time.monotonic() - self._last_save >= self.save_interval:
+                self._save()
+        return digest
+
+    def remove(self, path):
+        """Drop a file's index entries (the caller deletes the file)"""
+        with self._lock:
+            digests = {d for d, obj in self._index["objects"].items() if obj["path"] == path}
+            for digest in digests:
+                del self._index["objects"][digest]
+            for url in [u for u, d in self._index["urls"].items() if d in digests]:
+                del self._index["urls"][url]
+            if digests:
+                self._save()
+
+    def flush(self):
+        """Write the index now (after a batch that used save_interval)"""
+        with self._lock:
+            self._save()
+
+    @staticmethod
+    def _hash_file(path):
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        return sha.hexdigest()
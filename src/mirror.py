@@ -0,0 +1,262 @@
+"""LAN mirror for apod.nasa.gov
+
+One machine runs ``wall-y mirror``; every other desktop points APOD_BASE_URL,
+APOD_TODAY_URL and APOD_ARCHIVE_URL at it (with APOD_FALLBACK_URL set to the
+real site). The mirror fetches each page from upstream at most once per
+MIRROR_PAGE_TTL seconds (conditionally) and each image exactly once, and
+concurrent requests for the same path share one upstream fetch.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+CHUNK = 256 * 1024
+
+log = logging.getLogger("wall-y")
+
+
+class MirrorCache:
+    """Upstream responses on disk: one body file plus a JSON sidecar per path"""
+
+    def __init__(self, upstream_url, cache_dir, session, page_ttl=300):
+        self.upstream_url = upstream_url
+        self.cache_dir = cache_dir
+        self.session = session
+        self.page_ttl = page_ttl
+        self._lock = threading.Lock()
+        self._path_locks = {}
+        self.stats = {"requests": 0, "upstream_fetches": 0, "upstream_not_modified": 0,
+                      "stale_served": 0, "bytes_served": 0, "bytes_fetched": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _files(self, path):
+        key = hashlib.sha1(path.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + ".body", base + ".json"
+
+    def _path_lock(self, path):
+        with self._lock:
+            return self._path_locks.setdefault(path, threading.Lock())
+
+    def _load(self, path):
+        body_path, meta_path = self._files(path)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+        meta["body_path"] = body_path
+        return meta
+
+    def _fresh(self, path, meta):
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            # APOD image URLs never change content
+            return True
+        return time.time() - meta["checked_at"] < self.page_ttl
+
+    def get(self, path):
+        """Cached entry for a path, fetching or revalidating upstream when needed
+
+        Returns the metadata dict (with ``body_path``), ``{"status": code}``
+        for an upstream 4xx, or None if upstream failed and nothing is cached. Stale entries are served when upstream
+        is unreachable.
+        """
+        meta = self._load(path)
+        if meta and self._fresh(path, meta):
+            return meta
+        # One upstream request per path however many clients ask at once
+        with self._path_lock(path):
+            meta = self._load(path)
+            if meta and self._fresh(path, meta):
+                return meta
+            try:
+                return self._fetch(path, meta)
+            except Exception as e:
+                log.warning(f"Mirror: upstream fetch of {path} failed: {e}")
+                if meta:
+                    self.count("stale_served")
+                return meta
+
+    def _fetch(self, path, meta):
+        url = self.upstream_url + path.lstrip("/")
+        headers = {}
+        if meta:
+            if meta.get("upstream_etag"):
+                headers["If-None-Match"] = meta["upstream_etag"]
+            if meta.get("upstream_last_modified"):
+                headers["If-Modified-Since"] = meta["upstream_last_modified"]
+        self.count("upstream_fetches")
+        response = self.session.get(url, headers=headers, stream=True)
+        with response:
+            if response.status_code == 304 and meta:
+                self.count("upstream_not_modified")
+                meta["checked_at"] = time.time()
+                self._save_meta(path, meta)
+                return meta
+            if response.status_code != 200:
+                log.warning(f"Mirror: upstream returned {response.status_code} for {path}")
+                if response.status_code >= 500:
+                    return meta
+                # Passed through to the client, not cached
+                return {"status": response.status_code}
+
+            body_path, meta_path = self._files(path)
+            sha = hashlib.sha256()
+            size = 0
+            tmp_path = body_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(CHUNK):
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, body_path)
+            self.count("bytes_fetched", size)
+            now = time.time()
+            meta = {
+                "path": path,
+                "content_type": response.headers.get("Content-Type", "application/octet-stream"),
+                "size": size,
+                "etag": '"%s"' % sha.hexdigest()[:32],
+                "last_modified": response.headers.get("Last-Modified") or formatdate(now, usegmt=True),
+                "upstream_etag": response.headers.get("ETag"),
+                "upstream_last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": now,
+                "checked_at": now,
+            }
+            self._save_meta(path, meta)
+            meta["body_path"] = body_path
+            return meta
+
+    def _save_meta(self, path, meta):
+        _, meta_path = self._files(path)
+        data = {k: v for k, v in meta.items() if k != "body_path"}
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, meta_path)
+
+
+def _not_modified(headers, meta):
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match:
+        return meta["etag"] in [tag.strip() for tag in if_none_match.split(",")]
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(meta["last_modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def make_handler(cache):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/_mirror/stats":
+                data = json.dumps(cache.stats).encode("utf-8")
+                self._headers(200, {"Content-Type": "application/json", "Content-Length": str(len(data))})
+                self.wfile.write(data)
+                return
+            cache.count("requests")
+            meta = cache.get(path)
+            if meta is None or "status" in meta:
+                self._headers(meta["status"] if meta else 502, {"Content-Length": "0"})
+                return
+            validators = {
+                "ETag": meta["etag"],
+                "Last-Modified": meta["last_modified"],
+                "Cache-Control": "public, max-age=%d" % (
+                    31536000 if path.lower().endswith(IMAGE_EXTENSIONS) else cache.page_ttl),
+            }
+            if _not_modified(self.headers, meta):
+                self._headers(304, dict(validators, **{"Content-Length": "0"}))
+                return
+            self._send_file(meta, validators)
+
+        def _send_file(self, meta, validators):
+            size = os.path.getsize(meta["body_path"])
+            start = 0
+            range_header = self.headers.get("Range", "")
+            status = 200
+            headers = dict(validators, **{"Content-Type": meta["content_type"], "Accept-Ranges": "bytes"})
+            if range_header.startswith("bytes=") and range_header.endswith("-"):
+                try:
+                    start = int(range_header[len("bytes="):-1])
+                except ValueError:
+                    start = 0
+                if start >= size:
+                    self._headers(416, {"Content-Range": f"bytes */{size}", "Content-Length": "0"})
+                    return
+                if start:
+                    status = 206
+                    headers["Content-Range"] = f"bytes {start}-{size - 1}/{size}"
+            headers["Content-Length"] = str(size - start)
+            self._headers(status, headers)
+            with open(meta["body_path"], "rb") as f:
+                f.seek(start)
+                for block in iter(lambda: f.read(CHUNK), b""):
+                    self.wfile.write(block)
+            cache.count("bytes_served", size - start)
+
+        def _headers(self, status, headers):
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+
+    return Handler
+
+
+class MirrorServer:
+    """Threaded HTTP server in front of a MirrorCache"""
+
+    def __init__(self, cache, bind="0.0.0.0", port=8470):
+        self.cache = cache
+        self.httpd = ThreadingHTTPServer((bind, port), make_handler(cache))
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}/"
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def start(self):
+        """Serve on a background thread (for tests and embedding)"""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def create_mirror(settings, cache_dir, bind=None, port=None):
+    """Mirror of the real site: APOD_FALLBACK_URL if set (so the whole site can share
+    one settings.env), otherwise APOD_BASE_URL"""
+    from http_session import create_session
+    upstream_url = settings["APOD_FALLBACK_URL"] or settings["APOD_BASE_URL"]
+    session = create_session(dict(settings, APOD_BASE_URL=upstream_url, APOD_FALLBACK_URL=""))
+    cache = MirrorCache(upstream_url, cache_dir, session, page_ttl=settings["MIRROR_PAGE_TTL"])
+    return MirrorServer(cache, bind or settings["MIRROR_BIND"],
+                        settings["MIRROR_PORT"] if port is None else port)
@@ -0,0 +1,90 @@
+import os
+import json
+import threading
+import logging
+
+log = logging.getLogger("wall-y")
+
+
+class PageCache:
+    """Persistent conditional-GET cache for pages whose parsed result we keep"""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._data = {"entries": {}, "stats": {"hits": 0, "misses": 0}}
+        self._load()
+
+    def _load(self):
+        """Load the cache file, starting empty if it is missing or corrupt"""
+        try:
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._data["entries"].update(data.get("entries", {}))
+                self._data["stats"].update(data.get("stats", {}))
+        except Exception as e:
+            log.error(f"Error loading page cache, starting empty: {e}")
+
+    def _save(self):
+        """Write the cache atomically so a crash never leaves half a file"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            log.error(f"Error saving page cache: {e}")
+
+    def conditional_headers(self, url):
+        """Return If-None-Match / If-Modified-Since headers for a cached URL"""
+        with self._lock:
+            entry = self._data["entries"].get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get(self, url):
+        """The cached entry for a URL without touching the counters (None if absent)"""
+        with self._lock:
+            return self._data["entries"].get(url)
+
+    def hit(self, url):
+        """Record a 304 and return the cached entry (None if we have nothing stored)"""
+        with self._lock:
+            entry = self._data["entries"].get(url)
+            if entry is None:
+                return None
+            self._data["stats"]["hits"] += 1
+            self._save()
+            return entry
+
+    def store(self, url, response, parsed):
+        """Record a full response: keep its validators and the parsed result"""
+        with self._lock:
+            self._data["stats"]["misses"] += 1
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self._data["entries"][url] = {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "parsed": parsed,
+                }
+            else:
+                # Without validators the server can never answer 304
+                self._data["entries"].pop(url, None)
+            self._save()
+
+    def stats(self):
+        """Return hit/miss counters (persisted across restarts)"""
+        with self._lock:
+            stats = dict(self._data["stats"])
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        return stats
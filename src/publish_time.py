@@ -0,0 +1,24 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+# APOD publishes a new page at midnight US Eastern time (DST-aware)
+APOD_TZ = ZoneInfo("America/New_York")
+
+
+def latest_publish_instant(now=None):
+    """Most recent APOD publish instant (aware datetime) at or before now"""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    eastern = now.astimezone(APOD_TZ)
+    return datetime.datetime.combine(eastern.date(), datetime.time(0), tzinfo=APOD_TZ)
+
+
+def next_publish_instant(now=None):
+    """Next APOD publish instant strictly after now"""
+    latest = latest_publish_instant(now)
+    return datetime.datetime.combine(latest.date() + datetime.timedelta(days=1),
+                                     datetime.time(0), tzinfo=APOD_TZ)
+
+
+def apod_today(now=None):
+    """Date (YYYY-MM-DD) of the most recently published APOD day"""
+    return latest_publish_instant(now).date().isoformat()
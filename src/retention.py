@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import time
+import datetime
+import logging
+
+log = logging.getLogger("wall-y")
+
+POLICIES = ("lru", "favorites")
+# Leftover download/index temp files younger than this may still be in use (or resumable)
+TEMP_GRACE = 24 * 3600
+TEMP_SUFFIXES = (".part", ".tmp")
+# Derived files are "<image name>_<suffix>.jpg"; the group is the image part
+VARIANT_NAME = re.compile(r'^(.*)_(?:\d+x\d+_\w+|span_[0-9a-f]{8})\.jpg$')
+THUMBNAIL_NAME = re.compile(r'^(.*)_\d+\.jpg$')
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove(path):
+    """Delete a file, returning the bytes freed (0 if it was already gone)"""
+    size = _size(path)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    return size
+
+
+class Retention:
+    """Keeps Pictures/wall-y within byte, item-count and age limits
+
+    Each stored image (with its .txt sidecars, screen-sized variants and
+    gallery thumbnails) is one item. Items over the age limit go first, then
+    the least recently used until the count and byte caps are met. Under the "favorites" policy
+    favorite days are never evicted. Protected paths (the applied wallpaper)
+    are always kept, as are history.db and the cache indexes, which are
+    never candidates. A limit of 0 means unlimited.
+
+    Each run deletes at most ``batch`` items so it stays short; the next
+    update continues where it stopped.
+    """
+
+    def __init__(self, history, image_store, download_dir, variants_dir, thumbs_dir=None,
+                 max_bytes=0, max_items=0, max_age_days=0, policy="lru", batch=50):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown retention policy: {policy}")
+        self.history = history
+        self.image_store = image_store
+        self.download_dir = download_dir
+        self.variants_dir = variants_dir
+        self.thumbs_dir = thumbs_dir
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.max_age_days = max_age_days
+        self.policy = policy
+        self.batch = batch
+
+    def run(self, protected=()):
+        """Enforce the limits once; returns a report dict (also stored in history state)"""
+        started = time.monotonic()
+        report = {"removed": 0, "bytes_reclaimed": 0, "temp_files": 0}
+        report["bytes_reclaimed"] += self._clean_temp_files(report)
+
+        protected = {os.path.normcase(os.path.abspath(p)) for p in protected if p}
+        items = self._items()
+        total_bytes = sum(item["bytes"] for item in items)
+        count = len(items)
+
+        cutoff = None
+        if self.max_age_days:
+            cutoff = (datetime.datetime.now() - datetime.timedelta(days=self.max_age_days)).isoformat()
+
+        for item in items:
+            if report["removed"] >= self.batch:
+                break
+            if not self._evictable(item, protected):
+                continue
+            too_old = cutoff is not None and item["last_used"] < cutoff
+            too_many = self.max_items and count > self.max_items
+            too_big = self.max_bytes and total_bytes > self.max_bytes
+            if not (too_old or too_many or too_big):
+                # Items are least recently used first, so nothing later qualifies either
+                break
+            freed = self._evict(item)
+            report["removed"] += 1
+            report["bytes_reclaimed"] += freed
+            total_bytes -= item["bytes"]
+            count -= 1
+
+        report["items"] = count
+        report["bytes"] = total_bytes
+        report["over_budget"] = bool((self.max_items and count > self.max_items) or
+                                     (self.max_bytes and total_bytes > self.max_bytes))
+        report["ms"] = round((time.monotonic() - started) * 1000, 1)
+        self.history.set_state("retention_report", json.dumps(report))
+        return report
+
+    def _items(self):
+        """One entry per stored file, least recently used first"""
+        items = {}
+        for row in self.history.stored_images():
+            path = row["local_path"]
+            if not os.path.exists(path):
+                # Deleted by hand: just unlink it from the index
+                self.history.forget_local_path(path)
+                continue
+            item = items.get(path)
+            if item is None:
+                item = items[path] = {"path": path, "dates": [], "favorite": False, "last_used": ""}
+            item["dates"].append(row["date"])
+            item["favorite"] = item["favorite"] or bool(row.get("favorite"))
+            item["last_used"] = max(item["last_used"], row["applied_at"] or row["fetched_at"] or "")
+
+        variants = self._derived_index(self.variants_dir, VARIANT_NAME)
+        thumbnails = self._derived_index(self.thumbs_dir, THUMBNAIL_NAME)
+        for item in items.values():
+            item["files"] = ([item["path"]] + self._sidecars(item) +
+                             self._derived(variants, item["path"]) + self._derived(thumbnails, item["path"]))
+            item["bytes"] = sum(_size(p) for p in item["files"])
+        return sorted(items.values(), key=lambda item: item["last_used"])
+
+    def _sidecars(self, item):
+        paths = [os.path.join(self.download_dir, f"apod_{date}.txt") for date in item["dates"]]
+        return [p for p in paths if os.path.exists(p)]
+
+    @staticmethod
+    def _derived_index(directory, pattern):
+        """Map the image part of each derived file name in directory to its paths
+
+        Listed once per run so matching items against it stays linear.
+        """
+        index = {}
+        if not directory:
+            return index
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return index
+        for n in names:
+            match = pattern.match(n)
+            if match:
+                index.setdefault(match.group(1), []).append(os.path.join(directory, n))
+        return index
+
+    @staticmethod
+    def _derived(index, path):
+        """An image's variants or thumbnails from a _derived_index() map
+
+        They are keyed by the full file name; files cached before that were
+        keyed by the stem alone and still belong to the image.
+        """
+        name = os.path.basename(path)
+        stem = os.path.splitext(name)[0]
+        if stem == name:
+            return list(index.get(name, []))
+        return index.get(name, []) + index.get(stem, [])
+
+    def _evictable(self, item, protected):
+        if self.policy == "favorites" and item["favorite"]:
+            return False
+        return not any(os.path.normcase(os.path.abspath(p)) in protected for p in item["files"])
+
+    def _evict(self, item):
+        freed = 0
+        for path in item["files"]:
+            try:
+                freed += _remove(path)
+            except OSError as e:
+                log.warning(f"Retention: could not delete {path}: {e}")
+        self.image_store.remove(item["path"])
+        self.history.forget_local_path(item["path"])
+        log.info(f"Retention: evicted {os.path.basename(item['path'])} ({freed} bytes)")
+        return freed
+
+    def _clean_temp_files(self, report):
+        """Delete stale .part/.tmp files left by interrupted downloads or writes"""
+        freed = 0
+        now = time.time()
+        for directory, _, names in os.walk(self.download_dir):
+            for name in names:
+                if not name.endswith(TEMP_SUFFIXES):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    if now - os.path.getmtime(path) < TEMP_GRACE:
+                        continue
+                    freed += _remove(path)
+                    report["temp_files"] += 1
+                except OSError as e:
+                    log.warning(f"Retention: could not delete {path}: {e}")
+        return freed
@@ -0,0 +1,122 @@
+import datetime
+import logging
+from PyQt5 import QtCore
+from publish_time import latest_publish_instant, next_publish_instant
+
+log = logging.getLogger("wall-y")
+
+
+class PublishScheduler(QtCore.QObject):
+    """Asks for an APOD check only when a new page can exist
+
+    Idles until the next publish instant, then polls with bounded exponential
+    backoff until the new APOD has been applied (or the poll window ends).
+    Seeing the new page is not enough: if its download or apply fails, the
+    polling goes on and retries it.
+    A cheap wall-clock heartbeat (no network) drives it, so a machine waking
+    from sleep after a publish catches up on the next tick.
+    """
+
+    # Run a scheduled check now; answer with on_check_finished()
+    check_due = QtCore.pyqtSignal()
+
+    def __init__(self, history, parent=None, grace=120, initial_backoff=300,
+                 max_backoff=3600, poll_window=6 * 3600, heartbeat_ms=60 * 1000, settings=None):
+        super().__init__(parent)
+        self.history = history
+        # For NO_IMAGE_FALLBACK; read on use so the settings dialog's changes apply
+        self.settings = settings if settings is not None else {}
+        self.grace = datetime.timedelta(seconds=grace)
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.poll_window = datetime.timedelta(seconds=poll_window)
+
+        self.expected_date = None
+        # The latest page info at or past expected_date, until it has been applied
+        self.pending_info = None
+        self.due_at = None
+        self.backoff = initial_backoff
+        self.in_flight = False
+
+        self.heartbeat = QtCore.QTimer(self)
+        self.heartbeat.timeout.connect(self._tick)
+        self.heartbeat_ms = heartbeat_ms
+
+    def start(self):
+        """Begin scheduling; the startup check itself is left to the caller"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self._begin_cycle(latest_publish_instant(now), now)
+        self.heartbeat.start(self.heartbeat_ms)
+
+    def satisfied(self):
+        """True once the APOD for the latest publish instant has been applied"""
+        return self.history.get_state("last_apod_date_seen", "") >= self.expected_date
+
+    def on_info(self, image_info):
+        """Any freshly fetched page info; the new APOD date ends the polling once applied"""
+        if not image_info:
+            return
+        # Page cache entries written before 'apod_date' existed only carry the parsed 'date'
+        apod_date = image_info['apod_date'] if 'apod_date' in image_info else image_info.get('date')
+        if apod_date and apod_date >= self.expected_date and not self.satisfied():
+            self.pending_info = dict(image_info, apod_date=apod_date)
+            self._settle()
+
+    def on_update_finished(self, success, *args):
+        """An update ended (UpdateEngine.update_finished); a successful one may have applied the new day"""
+        if success:
+            self._settle()
+
+    def _settle(self):
+        """Stop polling if the pending day has been applied (or needs nothing applied)"""
+        info = self.pending_info
+        if info is None or self.satisfied():
+            return
+        if info.get('no_image'):
+            # The fallback is applied once per non-image day; "keep" applies nothing
+            done = (self.settings.get("NO_IMAGE_FALLBACK") == "keep" or
+                    self.history.get_state("fallback_date") == info.get('date'))
+        else:
+            done = bool(info.get('url')) and self.history.get_state("last_image_url") == info['url']
+        if done:
+            self.pending_info = None
+            self.history.set_state("last_apod_date_seen", info['apod_date'])
+            log.info(f"APOD for {info['apod_date']} applied; next check at {self.next_check_time()}")
+
+    def on_check_finished(self):
+        """A scheduled check completed (with or without new info)"""
+        self.in_flight = False
+        if self.satisfied():
+            return
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if now - latest_publish_instant(now) > self.poll_window:
+            # Non-image day or an outage: stop until the next publish
+            log.info(f"No new APOD within the poll window; waiting for {next_publish_instant(now)}")
+            self.history.set_state("last_apod_date_seen", self.expected_date)
+            return
+        self.due_at = now + datetime.timedelta(seconds=self.backoff)
+        self.backoff = min(self.backoff * 2, self.max_backoff)
+
+    def next_check_time(self):
+        """When the next network check will happen (aware datetime)"""
+        if self.satisfied():
+            return next_publish_instant()
+        return self.due_at
+
+    def _begin_cycle(self, publish, now):
+        self.expected_date = publish.date().isoformat()
+        self.pending_info = None
+        self.backoff = self.initial_backoff
+        self.due_at = max(publish + self.grace, now + self.grace)
+
+    def _tick(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        publish = latest_publish_instant(now)
+        if publish.date().isoformat() > self.expected_date:
+            # Crossed a publish instant (possibly while the machine was asleep)
+            self._begin_cycle(publish, now)
+        if self.in_flight or self.satisfied():
+            return
+        if now >= self.due_at:
+            self.in_flight = True
+            self.check_due.emit()
@@ -0,0 +1,54 @@
+import time
+import threading
+
+
+class SingleFlight:
+    """Short-TTL memo around a callable that coalesces concurrent calls
+
+    While a call is in flight, other callers wait for it and share its
+    result instead of starting their own. Successful (non-None) results
+    are reused for ``ttl`` seconds; ``ttl=0`` only coalesces.
+    """
+
+    def __init__(self, func, ttl=0):
+        self.func = func
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._result = None
+        self._result_time = None
+
+    def __call__(self):
+        with self._lock:
+            if (self._result_time is not None
+                    and time.monotonic() - self._result_time < self.ttl):
+                return self._result
+            if self._inflight is not None:
+                event = self._inflight
+                leader = False
+            else:
+                event = self._inflight = threading.Event()
+                leader = True
+
+        if not leader:
+            event.wait()
+            return event.result
+
+        event.result = None
+        try:
+            event.result = self.func()
+            return event.result
+        finally:
+            result = event.result
+            with self._lock:
+                if result is not None and self.ttl > 0:
+                    self._result = result
+                    self._result_time = time.monotonic()
+                self._inflight = None
+            event.set()
+
+    def invalidate(self):
+        """Drop the memoized result so the next call runs the function again"""
+        with self._lock:
+            self._result = None
+            self._result_time = None
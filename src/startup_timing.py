@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import time
+import platform
+import datetime
+import logging
+
+log = logging.getLogger("wall-y")
+
+
+class StartupTimer:
+    """Records how long each startup phase takes
+
+    mark(phase) stores the time since the previous mark (and since the timer
+    was created). write() appends one JSON line per start to a report file so
+    boot-time regressions can be compared across runs and machines.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append({
+            "phase": phase,
+            "ms": round((now - self._last) * 1000, 1),
+            "at_ms": round((now - self.started) * 1000, 1),
+        })
+        self._last = now
+
+    def report(self):
+        return {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "machine": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "total_ms": self.phases[-1]["at_ms"] if self.phases else 0.0,
+            "phases": self.phases,
+        }
+
+    def write(self, report_path):
+        """Append this start's report as one JSON line; returns the report"""
+        report = self.report()
+        try:
+            os.makedirs(os.path.dirname(report_path), exist_ok=True)
+            with open(report_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(report) + "\n")
+        except Exception as e:
+            log.error(f"Error writing startup report: {e}")
+        return report
@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import uuid
+import datetime
+import threading
+import collections
+import logging
+
+# Rotate the JSON lines file (and the diagnostics log) once it grows past this
+MAX_LOG_BYTES = 5 * 1024 * 1024
+RECENT_SPANS = 200
+# Logger shared by the core and the tray modules
+LOG_NAME = "wall-y"
+
+log = logging.getLogger(LOG_NAME)
+
+
+def configure_logging(path):
+    """Write diagnostics to a rotating log file, and to stdout when there is one
+
+    Frozen GUI builds have no console (sys.stdout is None), so the file is
+    the only place their messages end up. A later call with another path
+    moves the file log there.
+    """
+    from logging.handlers import RotatingFileHandler
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    path = os.path.abspath(path)
+    for handler in list(log.handlers):
+        if isinstance(handler, RotatingFileHandler) and handler.baseFilename != path:
+            log.removeHandler(handler)
+            handler.close()
+    if not any(getattr(handler, "baseFilename", None) == path for handler in log.handlers):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=MAX_LOG_BYTES, backupCount=1, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(threadName)s: %(message)s"))
+        log.addHandler(handler)
+    if sys.stdout is not None and not any(type(handler) is logging.StreamHandler for handler in log.handlers):
+        # Same plain lines on the console as before the file log existed
+        log.addHandler(logging.StreamHandler(sys.stdout))
+
+
+class Tracer:
+    """Records timed spans and running counters for the update pipeline
+
+    A span is one phase (fetch, parse, download, metadata, apply) with its
+    duration and attributes such as bytes, cache_hit and retries. Spans
+    opened inside another span on the same thread share its trace id, so
+    one update's phases can be grouped. Finished spans are appended as JSON
+    lines to the configured file and folded into per-phase counters.
+    """
+
+    def __init__(self):
+        self.path = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._recent = collections.deque(maxlen=RECENT_SPANS)
+        self._counters = {}
+        self.started = datetime.datetime.now().isoformat(timespec="seconds")
+
+    def configure(self, path):
+        """Write spans to a JSON lines file (None keeps them in memory only)"""
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def span(self, name, **attrs):
+        return _Span(self, name, attrs)
+
+    def annotate(self, **attrs):
+        """Add attributes to the innermost open span on this thread (no-op outside a span)"""
+        stack = self._stack()
+        if stack:
+            stack[-1].attrs.update(attrs)
+
+    def add(self, **attrs):
+        """Add numeric attributes (e.g. retries) to the innermost open span"""
+        stack = self._stack()
+        if stack:
+            span_attrs = stack[-1].attrs
+            for key, value in attrs.items():
+                span_attrs[key] = span_attrs.get(key, 0) + value
+
+    def _finish(self, record):
+        with self._lock:
+            self._recent.append(record)
+            counter = self._counters.setdefault(record["name"], {
+                "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0,
+                "bytes": 0, "cache_hits": 0, "retries": 0,
+            })
+            counter["count"] += 1
+            counter["errors"] += 1 if record.get("error") or record["attrs"].get("error") else 0
+            counter["total_ms"] = round(counter["total_ms"] + record["ms"], 3)
+            counter["max_ms"] = max(counter["max_ms"], record["ms"])
+            counter["last_ms"] = record["ms"]
+            attrs = record["attrs"]
+            counter["bytes"] += int(attrs.get("bytes") or 0)
+            counter["cache_hits"] += 1 if attrs.get("cache_hit") else 0
+            counter["retries"] += int(attrs.get("retries") or 0)
+            if self.path:
+                self._write(record)
+
+    def _write(self, record):
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > MAX_LOG_BYTES:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            log.error(f"Error writing metrics: {e}")
+
+    def snapshot(self):
+        """Counters per phase plus process info, as served on the metrics endpoint"""
+        with self._lock:
+            counters = {name: dict(values) for name, values in self._counters.items()}
+        for values in counters.values():
+            values["avg_ms"] = round(values["total_ms"] / values["count"], 3) if values["count"] else 0.0
+        import platform
+        return {"machine": platform.node(), "started": self.started, "pid": os.getpid(), "phases": counters}
+
+    def recent(self):
+        with self._lock:
+            return list(self._recent)
+
+
+class _Span:
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = dict(attrs)
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.parent = stack[-1] if stack else None
+        self.trace_id = self.parent.trace_id if self.parent else uuid.uuid4().hex[:16]
+        self.timestamp = datetime.datetime.now().isoformat(timespec="milliseconds")
+        self.started = time.perf_counter()
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = round((time.perf_counter() - self.started) * 1000, 3)
+        self.tracer._stack().pop()
+        record = {
+            "ts": self.timestamp,
+            "trace": self.trace_id,
+            "name": self.name,
+            "parent": self.parent.name if self.parent else None,
+            "ms": ms,
+            "attrs": self.attrs,
+        }
+        if exc is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(record)
+        return False
+
+
+class MetricsServer:
+    """Serves the tracer's counters on a loopback-only HTTP endpoint
+
+    GET /metrics returns the per-phase counters, GET /spans the most recent
+    spans. Runs on a daemon thread; binding failures are reported, not raised.
+    """
+
+    def __init__(self, tracer, port):
+        self.tracer = tracer
+        self.port = port
+        self.httpd = None
+
+    def start(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        tracer = self.tracer
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") in ("", "/metrics"):
+                    body = tracer.snapshot()
+                elif self.path.rstrip("/") == "/spans":
+                    body = tracer.recent()
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = json.dumps(body, default=str).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        try:
+            self.httpd = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        except OSError as e:
+            log.warning(f"Metrics endpoint not started on port {self.port}: {e}")
+            return False
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        log.info(f"Metrics available at http://127.0.0.1:{self.httpd.server_address[1]}/metrics")
+        return True
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+# Process-wide tracer; modules record into it with span() / annotate() / add()
+tracer = Tracer()
+span = tracer.span
+annotate = tracer.annotate
+add = tracer.add
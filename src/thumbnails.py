@@ -0,0 +1,33 @@
+import os
+
+THUMB_SIZE = 192
+
+
+def thumbnail_path(thumbs_dir, src_path, size=THUMB_SIZE):
+    """Cache file for one image's thumbnail at a given bounding size"""
+    # Keyed by the full source name so foo.jpg and foo.png get separate thumbnails
+    name = os.path.basename(src_path)
+    return os.path.join(thumbs_dir, f"{name}_{size}.jpg")
+
+
+def make_thumbnail(src_path, thumbs_dir, size=THUMB_SIZE, quality=80):
+    """Return a cached thumbnail of src_path that fits in size x size
+
+    JPEGs are decoded with draft() at 1/2-1/8 scale, so even very large
+    APODs are read without decoding the full-resolution pixels. Thumbnails
+    are regenerated only when the source is newer than the cached file.
+    """
+    out_path = thumbnail_path(thumbs_dir, src_path, size)
+    if os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(src_path):
+        return out_path
+
+    from PIL import Image
+    with Image.open(src_path) as img:
+        img.draft('RGB', (size, size))
+        img = img.convert('RGB')
+        img.thumbnail((size, size), Image.LANCZOS)
+        os.makedirs(thumbs_dir, exist_ok=True)
+        tmp_path = out_path + ".tmp"
+        img.save(tmp_path, "JPEG", quality=quality)
+        os.replace(tmp_path, out_path)
+    return out_path
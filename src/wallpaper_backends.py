@@ -0,0 +1,185 @@
+import os
+import sys
+import ctypes
+import shutil
+import subprocess
+import logging
+
+from wallpaper_variants import compose_span
+
+log = logging.getLogger("wall-y")
+
+SPI_SETDESKWALLPAPER = 20
+SPIF_UPDATEINIFILE_SENDCHANGE = 3
+# Control Panel\Desktop WallpaperStyle values
+STYLE_FILL = "10"
+STYLE_SPAN = "22"
+
+
+class WallpaperBackend:
+    """Applies wallpaper files to the desktop
+
+    apply() sets one image for every monitor. apply_per_monitor() takes
+    {monitor name: path} plus the monitor layout; backends that cannot set
+    monitors individually get the default span composition.
+    """
+
+    name = "none"
+
+    def __init__(self, variants_dir):
+        self.variants_dir = variants_dir
+
+    def apply(self, path):
+        raise NotImplementedError
+
+    def apply_per_monitor(self, src_path, variants, monitors):
+        return self.apply(compose_span(src_path, self.variants_dir, monitors, variants))
+
+    def current(self):
+        """Path of the wallpaper the desktop shows now (None if unknown)"""
+        return None
+
+    def set_lock_screen(self, path):
+        log.warning(f"Lock screen wallpaper is not supported by the {self.name} backend")
+        return False
+
+
+class NullBackend(WallpaperBackend):
+    """Does nothing but log; for servers, batch jobs and unsupported desktops"""
+
+    def apply(self, path):
+        log.warning(f"No wallpaper backend for {sys.platform}; prepared {path}")
+        return True
+
+    def apply_per_monitor(self, src_path, variants, monitors):
+        for name, path in variants.items():
+            log.warning(f"No wallpaper backend for {sys.platform}; prepared {path} for {name}")
+        return True
+
+
+class WindowsBackend(WallpaperBackend):
+    """SystemParametersInfo with the registry WallpaperStyle set to match
+
+    Windows has no per-monitor wallpaper without COM, so multi-monitor layouts
+    are composed into one virtual-desktop-sized image and applied as "Span".
+    """
+
+    name = "windows"
+
+    def apply(self, path):
+        if self._get_style() == STYLE_SPAN:
+            # Back to one monitor after a spanned layout
+            self._set_style(STYLE_FILL)
+        return self._set(path)
+
+    def apply_per_monitor(self, src_path, variants, monitors):
+        span_path = compose_span(src_path, self.variants_dir, monitors, variants)
+        self._set_style(STYLE_SPAN)
+        return self._set(span_path)
+
+    def current(self):
+        import winreg
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Control Panel\Desktop")
+        try:
+            return winreg.QueryValueEx(key, "WallPaper")[0]
+        finally:
+            winreg.CloseKey(key)
+
+    def set_lock_screen(self, path):
+        # No public API for the lock screen image: open its settings page for the user
+        subprocess.run(["start", "ms-settings:lockscreen"], shell=True)
+        log.info(f"Lock screen wallpaper downloaded to {path}; set it in Windows Settings")
+        return True
+
+    def _get_style(self):
+        import winreg
+        try:
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Control Panel\Desktop")
+        except OSError:
+            return None
+        try:
+            return winreg.QueryValueEx(key, "WallpaperStyle")[0]
+        except OSError:
+            return None
+        finally:
+            winreg.CloseKey(key)
+
+    def _set_style(self, style):
+        import winreg
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Control Panel\Desktop", 0, winreg.KEY_SET_VALUE)
+        try:
+            winreg.SetValueEx(key, "WallpaperStyle", 0, winreg.REG_SZ, style)
+            winreg.SetValueEx(key, "TileWallpaper", 0, winreg.REG_SZ, "0")
+        finally:
+            winreg.CloseKey(key)
+
+    def _set(self, path):
+        ok = ctypes.windll.user32.SystemParametersInfoW(
+            SPI_SETDESKWALLPAPER, 0, path, SPIF_UPDATEINIFILE_SENDCHANGE)
+        return bool(ok)
+
+
+class GnomeBackend(WallpaperBackend):
+    """GNOME (and other gsettings-based desktops) on Linux"""
+
+    name = "gnome"
+    SCHEMA = "org.gnome.desktop.background"
+
+    def apply(self, path):
+        uri = "file://" + os.path.abspath(path)
+        ok = self._gsettings("set", self.SCHEMA, "picture-uri", uri)
+        # GNOME 42+ keeps a separate image for the dark style; older versions lack the key
+        self._gsettings("set", self.SCHEMA, "picture-uri-dark", uri)
+        self._gsettings("set", self.SCHEMA, "picture-options", "zoom")
+        return ok
+
+    def apply_per_monitor(self, src_path, variants, monitors):
+        span_path = compose_span(src_path, self.variants_dir, monitors, variants)
+        uri = "file://" + os.path.abspath(span_path)
+        ok = self._gsettings("set", self.SCHEMA, "picture-uri", uri)
+        self._gsettings("set", self.SCHEMA, "picture-uri-dark", uri)
+        self._gsettings("set", self.SCHEMA, "picture-options", "spanned")
+        return ok
+
+    def current(self):
+        result = subprocess.run(["gsettings", "get", self.SCHEMA, "picture-uri"],
+                                capture_output=True, text=True)
+        uri = result.stdout.strip().strip("'")
+        return uri[len("file://"):] if uri.startswith("file://") else None
+
+    def set_lock_screen(self, path):
+        return self._gsettings("set", "org.gnome.desktop.screensaver", "picture-uri",
+                               "file://" + os.path.abspath(path))
+
+    @staticmethod
+    def _gsettings(*args):
+        result = subprocess.run(["gsettings", *args], capture_output=True, text=True)
+        return result.returncode == 0
+
+    @staticmethod
+    def available():
+        desktop = os.environ.get("XDG_CURRENT_DESKTOP", "").lower()
+        return bool(shutil.which("gsettings")) and any(
+            name in desktop for name in ("gnome", "unity", "cinnamon", "budgie"))
+
+
+BACKENDS = {
+    "windows": WindowsBackend,
+    "gnome": GnomeBackend,
+    "none": NullBackend,
+}
+
+
+def get_backend(name, variants_dir):
+    """Backend for a WALLPAPER_BACKEND setting ("auto" picks one for this platform)"""
+    name = (name or "auto").lower()
+    if name == "auto":
+        if sys.platform == "win32":
+            name = "windows"
+        elif GnomeBackend.available():
+            name = "gnome"
+        else:
+            name = "none"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown wallpaper backend: {name}")
+    return BACKENDS[name](variants_dir)
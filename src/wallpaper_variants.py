@@ -0,0 +1,119 @@
+import os
+import hashlib
+# PIL is imported inside the functions so loading this module stays cheap
+
+FIT_MODES = ("fill", "fit")
+
+
+def variant_path(variants_dir, src_path, width, height, mode):
+    """Cache file for one (image, resolution, fit mode) combination"""
+    # Keyed by the full source name so foo.jpg and foo.png get separate variants
+    name = os.path.basename(src_path)
+    return os.path.join(variants_dir, f"{name}_{width}x{height}_{mode}.jpg")
+
+
+def target_size(src_size, width, height, mode):
+    """Size to scale the source to: covering the screen (fill) or inside it (fit)"""
+    src_w, src_h = src_size
+    if mode == "fill":
+        scale = max(width / src_w, height / src_h)
+    else:
+        scale = min(width / src_w, height / src_h)
+    return max(1, round(src_w * scale)), max(1, round(src_h * scale))
+
+
+def make_variant(src_path, variants_dir, width, height, mode="fill", quality=90):
+    """Return a copy of src_path scaled (and for "fill", cropped) to the screen
+
+    The source is returned unchanged when it is already no larger than the
+    screen. Variants are cached, so each resolution/mode is produced once.
+    JPEGs are decoded at reduced scale with draft(), which keeps peak memory
+    close to the size of the output rather than of the original.
+    """
+    if mode not in FIT_MODES:
+        raise ValueError(f"Unknown fit mode: {mode}")
+    out_path = variant_path(variants_dir, src_path, width, height, mode)
+    if os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(src_path):
+        return out_path
+
+    from PIL import Image
+    with Image.open(src_path) as img:
+        if img.width <= width and img.height <= height:
+            return src_path
+
+        scaled_w, scaled_h = target_size(img.size, width, height, mode)
+        # Let the JPEG decoder do most of the downscaling (1/2, 1/4 or 1/8 DCT scaling)
+        img.draft('RGB', (scaled_w, scaled_h))
+        img = img.convert('RGB')
+
+        # Cheap integer box reduction down to just above the target, then a precise resample
+        factor = min(img.width // scaled_w, img.height // scaled_h)
+        if factor >= 2:
+            img = img.reduce(factor)
+        img = img.resize((scaled_w, scaled_h), Image.LANCZOS)
+
+        if mode == "fill":
+            left = (scaled_w - width) // 2
+            top = (scaled_h - height) // 2
+            img = img.crop((left, top, left + width, top + height))
+
+        os.makedirs(variants_dir, exist_ok=True)
+        tmp_path = out_path + ".tmp"
+        img.save(tmp_path, "JPEG", quality=quality, optimize=True)
+        os.replace(tmp_path, out_path)
+    return out_path
+
+
+def make_monitor_variants(src_path, variants_dir, monitors, mode="fill", executor=None):
+    """Produce one variant per distinct monitor size, in parallel when an executor is given
+
+    ``monitors`` is a list of dicts with ``name``, ``x``, ``y``, ``width`` and
+    ``height`` in physical pixels. Returns {monitor name: variant path}.
+    """
+    sizes = sorted({(m["width"], m["height"]) for m in monitors})
+    if executor is not None and len(sizes) > 1:
+        futures = {size: executor.submit(make_variant, src_path, variants_dir, size[0], size[1], mode)
+                   for size in sizes}
+        paths = {size: future.result() for size, future in futures.items()}
+    else:
+        paths = {size: make_variant(src_path, variants_dir, size[0], size[1], mode) for size in sizes}
+    return {m["name"]: paths[(m["width"], m["height"])] for m in monitors}
+
+
+def compose_span(src_path, variants_dir, monitors, variants, quality=90):
+    """Lay per-monitor variants out on one canvas covering the whole virtual desktop
+
+    Used by backends that can only set a single "span" wallpaper.
+    """
+    left = min(m["x"] for m in monitors)
+    top = min(m["y"] for m in monitors)
+    right = max(m["x"] + m["width"] for m in monitors)
+    bottom = max(m["y"] + m["height"] for m in monitors)
+    layout = ";".join(f"{m['x']},{m['y']},{m['width']},{m['height']}" for m in monitors)
+    layout_key = hashlib.sha1(layout.encode("utf-8")).hexdigest()[:8]
+    name = os.path.basename(src_path)
+    out_path = os.path.join(variants_dir, f"{name}_span_{layout_key}.jpg")
+    if os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(src_path):
+        return out_path
+
+    from PIL import Image
+    canvas = Image.new("RGB", (right - left, bottom - top))
+    for m in monitors:
+        with Image.open(variants[m["name"]]) as tile:
+            if tile.size != (m["width"], m["height"]):
+                # Source smaller than this monitor: centre it on the monitor's area
+                offset = ((m["width"] - tile.width) // 2, (m["height"] - tile.height) // 2)
+            else:
+                offset = (0, 0)
+            canvas.paste(tile.convert("RGB"), (m["x"] - left + offset[0], m["y"] - top + offset[1]))
+    tmp_path = out_path + ".tmp"
+    canvas.save(tmp_path, "JPEG", quality=quality)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def create_executor(monitors):
+    """Process pool sized to the work: one process per distinct monitor size, capped at the CPU count"""
+    from concurrent.futures import ProcessPoolExecutor
+    sizes = {(m["width"], m["height"]) for m in monitors}
+    return ProcessPoolExecutor(max_workers=max(1, min(len(sizes), os.cpu_count() or 1)))
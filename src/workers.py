@@ -0,0 +1,146 @@
+import logging
+from PyQt5 import QtCore
+
+log = logging.getLogger("wall-y")
+
+
+class Task(QtCore.QRunnable):
+    """QRunnable that calls a plain function on a pool thread"""
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.setAutoDelete(True)
+
+    def run(self):
+        self.fn(*self.args, **self.kwargs)
+
+
+class UpdateEngine(QtCore.QObject):
+    """Runs APOD network and image work on a thread pool and reports back via signals
+
+    Signals are emitted from pool threads; Qt queues them to the receivers'
+    (GUI) thread, so slots connected from SystemTrayApp never block the tray.
+    """
+
+    # Human-readable status of the running job
+    progress = QtCore.pyqtSignal(str)
+    # Latest image info (dict)
+    info_ready = QtCore.pyqtSignal(object)
+    # The startup check could not get image info; fall back to local state
+    info_unavailable = QtCore.pyqtSignal()
+    # success, image URL, show_notification
+    update_finished = QtCore.pyqtSignal(bool, object, bool)
+    # error message, show_notification
+    failed = QtCore.pyqtSignal(str, bool)
+    # A scheduler-requested check is over (whatever its outcome)
+    scheduled_check_finished = QtCore.pyqtSignal()
+    # History record of a past day fetched on request (dict)
+    day_ready = QtCore.pyqtSignal(object)
+
+    def __init__(self, wallpaper, parent=None):
+        super().__init__(parent)
+        self.wallpaper = wallpaper
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+
+    def _submit(self, fn, *args, show_notification=False):
+        self.pool.start(Task(self._guarded, fn, args, show_notification))
+
+    def _guarded(self, fn, args, show_notification):
+        """Run a job, turning any uncaught exception into a failed signal"""
+        try:
+            fn(*args)
+        except Exception as e:
+            log.exception(f"Error in background job: {e}")
+            self.progress.emit("")
+            self.failed.emit(str(e), show_notification)
+
+    def initial_check(self):
+        """Fetch the latest info, then update the wallpaper if a new image is out"""
+        self._submit(self._initial_check)
+
+    def check_scheduled(self):
+        """Fetch the latest info and update if a new image is available"""
+        self._submit(self._check_scheduled, show_notification=True)
+
+    def update(self, show_notification=True):
+        """Update the wallpaper in the background"""
+        self._submit(self._update, show_notification, show_notification=show_notification)
+
+    def apply(self, local_path, image_url=None):
+        """Apply an archived image (a past day, or again after a monitor layout change)"""
+        self._submit(self._apply, local_path, image_url)
+
+    def fetch_day(self, date):
+        """Download a past day that is not archived yet; day_ready carries its record"""
+        self._submit(self._fetch_day, date)
+
+    def fetch_description(self):
+        """Fetch the latest description in the background"""
+        self._submit(self._fetch_description)
+
+    def shutdown(self):
+        """Drop queued jobs; running ones finish on their own"""
+        self.pool.clear()
+
+    def _initial_check(self):
+        self.progress.emit("Checking for a new image...")
+        image_info = self.wallpaper.get_latest_image_info()
+        if not image_info:
+            self.progress.emit("")
+            self.info_unavailable.emit()
+            return
+        self.info_ready.emit(image_info)
+        if self.wallpaper.is_new_image_available():
+            self._update(True)
+        else:
+            self.progress.emit("")
+
+    def _check_scheduled(self):
+        try:
+            image_info = self.wallpaper.get_latest_image_info()
+            if image_info:
+                self.info_ready.emit(image_info)
+                if self.wallpaper.is_new_image_available():
+                    self._update(True)
+        finally:
+            self.scheduled_check_finished.emit()
+
+    def _update(self, show_notification):
+        self.progress.emit("Updating wallpaper...")
+        success, image_url = self.wallpaper.update_wallpaper()
+        if success and image_url:
+            self.wallpaper.record_last_update(image_url)
+        self.progress.emit("")
+        self.update_finished.emit(success, image_url, show_notification)
+        if success:
+            # Housekeeping after the new image is applied, still off the GUI thread
+            self.wallpaper.enforce_retention()
+
+    def _apply(self, local_path, image_url):
+        self.progress.emit("Applying wallpaper...")
+        if self.wallpaper.set_wallpaper(local_path) and image_url:
+            self.wallpaper.history.mark_applied(image_url, latest=False)
+        self.progress.emit("")
+
+    def _fetch_day(self, date):
+        self.progress.emit(f"Fetching {date}...")
+        image_info, path = self.wallpaper.fetch_day(date)
+        self.progress.emit("")
+        record = self.wallpaper.history.get_by_date(date) if path else None
+        if record and record.get('local_path'):
+            self.day_ready.emit(record)
+        else:
+            self.failed.emit(f"No image for {date}", True)
+
+    def _fetch_description(self):
+        self.progress.emit("Fetching description...")
+        image_info = self.wallpaper.get_latest_image_info()
+        self.progress.emit("")
+        if image_info and not image_info.get('no_image'):
+            self.wallpaper.save_metadata_to_file(image_info)
+            self.wallpaper.history.record_image(image_info)
+            self.info_ready.emit(image_info)